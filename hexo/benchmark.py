@@ -0,0 +1,182 @@
+"""check_format 的基准测试
+
+生成一个合成的文章语料（默认 10000 篇），分别用旧的逐个调用 is_* 的
+实现和按行分类一次的新实现检查正文，报告耗时、加速比，并确认两者的
+错误输出完全一致。
+
+    python benchmark.py
+    python benchmark.py --posts 2000 --lines 300
+"""
+
+import sys
+import time
+import random
+import argparse
+
+from postlint import check_format
+
+# (行, 权重)：以普通段落为主，夹杂列表、引用、代码块和公式块
+SAMPLE_BLOCKS = (
+    (["这是一段普通的正文，介绍文章的背景和动机。\n", "\n"], 40),
+    (["Some plain English text in a paragraph.\n", "\n"], 20),
+    (["- 第一项\n", "- 第二项\n", "  - 子项\n", "\n"], 8),
+    (["正文后直接接列表\n", "* 缺少空行的列表\n", "\n"], 2),
+    (["1. 第一步\n", "2. 第二步\n", "10. 第十步\n", "\n"], 6),
+    (["> 引用的内容\n", "> 第二行\n", "\n"], 4),
+    (["引用前没有空行\n", "> 引用\n", "\n"], 1),
+    (["```python\n", "print('hello')\n", "```\n", "\n"], 8),
+    (["  ```\n", "indented code\n", "```\n", "text right after\n"], 1),
+    (["```\n", "code\n", "\n", "```\n", "\n"], 1),
+    (["$$\n", "E = mc^2\n", "$$\n", "\n"], 4),
+    (["  $$\n", "x\n", "$$\n", "\n"], 1),
+    (["windows line\r\n", "- item\r\n", "\r\n"], 2),
+)
+
+
+def legacy_check_format(lines):
+    """旧实现：每一行和上一行都反复调用 is_* 函数"""
+
+    def is_list(line):
+        s1 = line.startswith("* ") or line.startswith("- ") or line.startswith("+ ")
+        s2 = (line == "*\n") or (line == "-\n") or (line == "+\n")
+        return s1 or s2
+
+    def is_sublist(line):
+        return is_list(line.lstrip())
+
+    def is_quote(line):
+        return line.startswith("> ") or (line == ">\n")
+
+    def is_subquote(line):
+        return is_quote(line.lstrip())
+
+    def is_orderlist(line):
+        return line.split(". ", 1)[0].isdigit()
+
+    def is_ordersublist(line):
+        return is_orderlist(line.lstrip())
+
+    def is_sublatex(line):
+        return line.lstrip().startswith("$$")
+
+    def is_subcode(line):
+        return line.lstrip().startswith("```")
+
+    errors = []
+    previous_line = ""
+    line_number = 1
+    in_code_block = False
+    in_latex_block = False
+    code_previous_line = ""
+    latex_previous_line = ""
+    next_line_shoud_be_empty = False
+
+    for line in lines:
+        if next_line_shoud_be_empty:
+            if not line.strip() == "":
+                errors.append((line_number, previous_line, line, "empty line error"))
+            next_line_shoud_be_empty = False
+
+        if is_subcode(line):
+            in_code_block = not in_code_block
+            if in_code_block:
+                code_previous_line = line
+            else:
+                indent_in = code_previous_line.split("```", 1)[0]
+                indent_out = line.split("```", 1)[0]
+                if indent_in != indent_out:
+                    errors.append(
+                        (line_number - 1, code_previous_line, line, "code error")
+                    )
+                if len(indent_in) + len(indent_out) > 0:
+                    errors.append(
+                        (line_number - 1, code_previous_line, line, "code indent error")
+                    )
+                if previous_line.strip() == "":
+                    errors.append(
+                        (
+                            line_number - 1,
+                            previous_line,
+                            line,
+                            "code boundary empty line error",
+                        )
+                    )
+                next_line_shoud_be_empty = True
+
+        if is_sublatex(line):
+            in_latex_block = not in_latex_block
+            if in_latex_block:
+                latex_previous_line = line
+            else:
+                indent_in = latex_previous_line.split("$$", 1)[0]
+                indent_out = line.split("$$", 1)[0]
+                if indent_in != indent_out:
+                    errors.append(
+                        (line_number, latex_previous_line, line, "latex error")
+                    )
+
+        if (not in_code_block) and (not in_latex_block):
+            if (is_list(line) or is_orderlist(line)) and previous_line.lstrip():
+                flag = (
+                    is_sublist(previous_line)
+                    or is_ordersublist(previous_line)
+                    or is_subcode(previous_line)
+                    or is_sublatex(previous_line)
+                )
+                if not flag:
+                    errors.append((line_number, previous_line, line, "list error"))
+
+            if (is_quote(line) or is_subquote(line)) and previous_line.lstrip():
+                if not is_subquote(previous_line):
+                    errors.append((line_number, previous_line, line, "quote error"))
+
+        previous_line = line
+        line_number += 1
+    return errors
+
+
+def make_corpus(posts, lines_per_post, seed):
+    rng = random.Random(seed)
+    blocks, weights = zip(*SAMPLE_BLOCKS)
+    corpus = []
+    for _ in range(posts):
+        lines = ["---\n", "title: test\n", "---\n", "\n"]
+        while len(lines) < lines_per_post:
+            lines.extend(rng.choices(blocks, weights)[0])
+        corpus.append(lines)
+    return corpus
+
+
+def bench(corpus, check):
+    start = time.perf_counter()
+    results = [check(lines) for lines in corpus]
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark check_format.")
+    parser.add_argument("--posts", type=int, default=10000, help="Number of posts")
+    parser.add_argument("--lines", type=int, default=120, help="Lines per post")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.posts, args.lines, args.seed)
+    total_lines = sum(len(lines) for lines in corpus)
+    print(f"Corpus: {args.posts} posts, {total_lines} lines")
+
+    legacy_time, legacy_results = bench(corpus, legacy_check_format)
+    new_time, new_results = bench(corpus, check_format)
+    errors = sum(len(result) for result in new_results)
+
+    print(f"{'checker':<12} {'seconds':>8}")
+    print(f"{'legacy':<12} {legacy_time:>8.3f}")
+    print(f"{'classifier':<12} {new_time:>8.3f}")
+    print(f"Speedup: {legacy_time / new_time:.2f}x")
+    if legacy_results != new_results:
+        print("Error output differs!")
+        return 1
+    print(f"Identical error output ({errors} errors)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,10 @@
-python ./blogcheck.py
+python ./postlint.py
 
 if ($LastExitCode -ne 0) {
     Write-Host "blog check: fail."
     exit 1
 }
 
-python ./headcheck.py
-
-if ($LastExitCode -ne 0) {
-    Write-Host "head check: fail."
-    exit 1
-}
-
 $env:Path += "$((Get-Item -Path ../node_modules/.bin -Force).FullName);"
 
 hexo clean
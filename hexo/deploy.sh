@@ -1,19 +1,12 @@
 #!/bin/bash
 
-~/miniconda3/bin/python ./blogcheck.py
+~/miniconda3/bin/python ./postlint.py
 
 if [ $? -ne 0 ]; then
     echo "blog check: fail."
     exit 1
 fi
 
-~/miniconda3/bin/python ./headcheck.py
-
-if [ $? -ne 0 ]; then
-    echo "head check: fail."
-    exit 1
-fi
-
 ./hexo clean
 
 if [ $? -ne 0 ]; then
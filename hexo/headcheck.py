@@ -1,121 +1,65 @@
-import os
-import re
 import sys
-import yaml
+
+from postlint import (
+    ALLOWED_YAML_KEYS,
+    read_yaml_header,
+    parse_yaml,
+    check_header,
+    parse_args,
+    run,
+    watch,
+)
+
+# 检查逻辑在 postlint.py 中，这里只检查头部信息
+__all__ = [
+    "ALLOWED_YAML_KEYS",
+    "read_yaml_header",
+    "parse_yaml",
+    "check_header",
+    "check_file_path",
+    "main",
+]
 
 error_count = 0
 warning_count = 0
 
-# 允许的 YAML 项
-ALLOWED_YAML_KEYS = {"title", "date", "categories", "tags", "abbrlink", "hide"}
-
-
-def read_yaml_header(file_path):
-    """读取Markdown文件头部的YAML元数据"""
-    with open(file_path, "r", encoding="utf-8") as file:
-        lines = file.readlines()
-
-    # 找到YAML头部
-    if lines[0].strip() == "---":
-        header = []
-        for line in lines[1:]:
-            if line.strip() == "---":
-                break
-            header.append(line)
-
-        header_text = "".join(header)
-        return parse_yaml(header_text)
-    else:
-        return {}
-
-
-def parse_yaml(yaml_text):
-    """解析YAML文本并返回一个字典"""
-    return yaml.safe_load(yaml_text)
-
 
 def check_file_path(file_path, root_dir):
     """检查文件路径与分类是否匹配，并验证合法性"""
     global error_count, warning_count
 
-    relative_path = os.path.relpath(file_path, root_dir)
-    # 将相对路径分成目录和文件名
-    path_parts = os.path.dirname(relative_path).split(os.sep)
-
-    # 读取文件头部的YAML元数据
     header = read_yaml_header(file_path)
-
-    # 检查 YAML 中是否有不合法的项
-    for key in header.keys():
-        if key not in ALLOWED_YAML_KEYS:
+    for level, message, *_ in check_header(file_path, root_dir, header):
+        if level == "warning":
             warning_count += 1
-            print(
-                f"Warning[{warning_count}]: Invalid YAML key '{key}' in file '{file_path}'. "
-                f"Allowed keys are: {', '.join(ALLOWED_YAML_KEYS)}."
-            )
-
-    if "categories" in header:
-        categories = header["categories"]
-
-        # 定义正则表达式，匹配小写英文字母和数字的组合
-        category_pattern = re.compile(r"^[a-z0-9]+$")
-
-        # 检查分类和路径部分的合法性
-        for part in path_parts + categories:
-            if not category_pattern.match(part):
-                error_count += 1
-                print(
-                    f"Error[{error_count}]: Invalid name '{part}' in file '{file_path}'. "
-                    f"Only lowercase letters and digits are allowed."
-                )
-
-        # 检查目录结构是否与分类列表匹配
-        if path_parts != categories:
-            error_count += 1
-            print(
-                f"Error[{error_count}]: File '{file_path}' has categories {categories} but its path is '{relative_path}'."
-            )
-
-    # 检查tags的合法性
-    if "tags" in header:
-        if header["tags"]:
-            tags = header["tags"]
-
-            # 定义正则表达式，匹配大小写英文字母、数字、连字符和下划线
-            tag_pattern = re.compile(r"^[a-zA-Z0-9_-]+$")
-
-            # 检查tags中的每个tag
-            for tag in tags:
-                if not tag_pattern.match(tag):
-                    error_count += 1
-                    print(
-                        f"Error[{error_count}]: Invalid tag '{tag}' in file '{file_path}'. \n"
-                        f"Tags can only contain letters, numbers, hyphens, and underscores."
-                    )
+            print(f"Warning[{warning_count}]: {message}")
         else:
             error_count += 1
-            print(f"Error[{error_count}]: Empty in tags in file '{file_path}'.")
+            print(f"Error[{error_count}]: {message}")
 
 
 def main():
-    root_dir = "source/_posts"
-    # 遍历根目录下的所有文件
-    for root, _, files in os.walk(root_dir):
-        for file in files:
-            if file.endswith(".md"):
-                file_path = os.path.join(root, file)
-                check_file_path(file_path, root_dir)
+    global error_count, warning_count
+    args = parse_args("Check the front matter of blog posts.")
+    if args.watch:
+        watch(
+            body=False,
+            jobs=args.jobs,
+            cache_file=args.cache_file,
+            index_file=args.index_file,
+        )
+        return
+    reporter = run(
+        body=False,
+        jobs=args.jobs,
+        cache_file=args.cache_file,
+        index_file=args.index_file,
+    )
+    error_count = reporter.header_error_count
+    warning_count = reporter.warning_count
 
 
 if __name__ == "__main__":
     main()
 
-    if error_count == 0:
-        print("headcheck: pass")
-    else:
-        print(f"headcheck: {error_count} errors found.")
-
-    if warning_count > 0:
-        print(f"headcheck: {warning_count} warnings found.")
-
     sys.exit(error_count)
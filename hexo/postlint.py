@@ -0,0 +1,1185 @@
+import io
+import os
+import re
+import sys
+import json
+import time
+import yaml
+import ctypes
+import select
+import struct
+import hashlib
+import tempfile
+import argparse
+import functools
+import ctypes.util
+from concurrent.futures import ProcessPoolExecutor
+
+# 是否接受代码块的缩进
+allow_code_indent = False
+
+# 允许的 YAML 项
+ALLOWED_YAML_KEYS = {"title", "date", "categories", "tags", "abbrlink", "hide"}
+
+# 分类：小写英文字母和数字的组合
+CATEGORY_RE = re.compile(r"^[a-z0-9]+$")
+# 标签：大小写英文字母、数字、连字符和下划线
+TAG_RE = re.compile(r"^[a-zA-Z0-9_-]+$")
+
+# 安装了 libyaml 时使用 C 实现的解析器
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+ROOT_DIR = "source/_posts"
+
+# 检查规则变化时加一，旧的缓存随之失效
+RULES_VERSION = 2
+CACHE_FILE = ".postlint-cache"
+# 文章的头部信息索引，供跨文章检查和查询使用
+INDEX_VERSION = 1
+INDEX_FILE = ".postlint-index"
+# --watch 模式下等待多少秒没有新变化后开始检查
+WATCH_DEBOUNCE = 0.2
+
+
+def is_list(line):
+    s1 = line.startswith("* ") or line.startswith("- ") or line.startswith("+ ")
+    s2 = (line == "*\n") or (line == "-\n") or (line == "+\n")
+
+    return s1 or s2
+
+
+def is_sublist(line):
+    return is_list(line.lstrip())
+
+
+def is_quote(line):
+    return line.startswith("> ") or (line == ">\n")
+
+
+def is_subquote(line):
+    return is_quote(line.lstrip())
+
+
+def is_orderlist(line):
+    return line.split(". ", 1)[0].isdigit()
+
+
+def is_ordersublist(line):
+    return is_orderlist(line.lstrip())
+
+
+def is_latex(line):
+    return line.startswith("$$")
+
+
+def is_sublatex(line):
+    return is_latex(line.lstrip())
+
+
+def is_sublatex_strict(line):
+    return (not is_latex(line)) and is_sublatex(line)
+
+
+def is_code(line):
+    return line.startswith("```")
+
+
+def is_subcode(line):
+    return is_code(line.lstrip())
+
+
+def is_subcode_strict(line):
+    return (not is_code(line)) and is_subcode(line)
+
+
+# 行的类别，按位组合；sub 表示去掉行首空白后再判断
+BLANK = 1
+LIST = 2  # is_list 或 is_orderlist
+SUBLIST = 4  # is_sublist 或 is_ordersublist
+SUBQUOTE = 8
+SUBCODE = 16
+SUBLATEX = 32
+
+# 允许列表紧跟在这些行之后
+LIST_FOLLOWS = SUBLIST | SUBCODE | SUBLATEX
+
+
+def _bullet_kind(stripped):
+    return SUBLIST if stripped[1:2] == " " or stripped[1:] == "\n" else 0
+
+
+def _quote_kind(stripped):
+    return SUBQUOTE if stripped[1:2] == " " or stripped[1:] == "\n" else 0
+
+
+def _code_kind(stripped):
+    return SUBCODE if stripped.startswith("```") else 0
+
+
+def _latex_kind(stripped):
+    return SUBLATEX if stripped.startswith("$$") else 0
+
+
+def _order_kind(stripped):
+    return SUBLIST if stripped.split(". ", 1)[0].isdigit() else 0
+
+
+# 按去掉行首空白后的第一个字符选择判断方法，其余字符（数字除外）都是普通行
+LINE_KINDS = {
+    "*": _bullet_kind,
+    "-": _bullet_kind,
+    "+": _bullet_kind,
+    ">": _quote_kind,
+    "`": _code_kind,
+    "$": _latex_kind,
+}
+
+
+def classify(line):
+    """返回 (类别, 缩进)，与 is_* 系列函数的判断结果一致"""
+    stripped = line.lstrip()
+    if not stripped:
+        return BLANK, ""
+
+    first = stripped[0]
+    kind_of = LINE_KINDS.get(first)
+    if kind_of is not None:
+        kind = kind_of(stripped)
+    elif first.isdigit():
+        kind = _order_kind(stripped)
+    else:
+        return 0, ""
+
+    indent = line[: len(line) - len(stripped)]
+    if kind & SUBLIST and not indent:
+        kind |= LIST
+    return kind, indent
+
+
+def check_format(lines):
+    errors = []
+
+    previous_line = ""
+    previous_kind = BLANK
+
+    in_code_block = False  # 用于跟踪是否在代码块中
+    in_latex_block = False  # 用于跟踪是否在公式块中
+    code_previous_line = ""  # 用于确保缩进一致
+    latex_previous_line = ""  # 用于确保缩进一致
+    code_indent = ""
+    latex_indent = ""
+
+    next_line_shoud_be_empty = False  # 用于跟踪下一行是否是空行
+
+    # 每一行只分类一次，上一行的类别直接沿用
+    for line_number, line in enumerate(lines, start=1):
+        kind, indent = classify(line)
+
+        # 是否之前要求下一行是空行
+        if next_line_shoud_be_empty:
+            if not kind & BLANK:  # 下一行却不是空行
+                errors.append((line_number, previous_line, line, "empty line error"))
+
+            next_line_shoud_be_empty = False
+
+        # 处于代码块边界时，检查代码块的缩进整齐
+        if kind & SUBCODE:
+            in_code_block = not in_code_block
+
+            if in_code_block:  # 如果正在进入代码块
+                code_previous_line = line
+                code_indent = indent
+
+            else:  # 如果正在退出代码块
+                # 要求缩进一致
+                if code_indent != indent:
+                    errors.append(
+                        (line_number - 1, code_previous_line, line, "code error")
+                    )
+
+                # 只在退出时检查两个边界的缩进，因此一个代码块只会检查一次
+                if (not allow_code_indent) and (code_indent or indent):
+                    errors.append(
+                        (line_number - 1, code_previous_line, line, "code indent error")
+                    )
+
+                # 不允许代码块的退出边界的前一行是空行
+                if previous_kind & BLANK:
+                    errors.append(
+                        (
+                            line_number - 1,
+                            previous_line,
+                            line,
+                            "code boundary empty line error",
+                        )
+                    )
+
+                next_line_shoud_be_empty = True  # 代码块的下一行必须是空行
+
+        # 处于公式块边界时，检查公式块的缩进整齐
+        if kind & SUBLATEX:
+            in_latex_block = not in_latex_block
+
+            if in_latex_block:  # 如果正在进入公式块
+                latex_previous_line = line
+                latex_indent = indent
+            else:  # 如果正在退出公式块
+                # 要求缩进一致
+                if latex_indent != indent:
+                    errors.append(
+                        (line_number, latex_previous_line, line, "latex error")
+                    )
+
+        # 如果当前不位于代码块或者公式块边界或内部，则会继续检查
+        if (not in_code_block) and (not in_latex_block):
+            # 检查当前行是否是列表，并且要求前一行非空
+            if kind & LIST and not previous_kind & BLANK:
+                # 合法情况
+                if not previous_kind & LIST_FOLLOWS:
+                    errors.append((line_number, previous_line, line, "list error"))
+
+            # 检查当前行是否是引用，并且要求前一行非空
+            if kind & SUBQUOTE and not previous_kind & BLANK:
+                # 合法情况
+                if not previous_kind & SUBQUOTE:
+                    errors.append((line_number, previous_line, line, "quote error"))
+
+        previous_line = line
+        previous_kind = kind
+    return errors
+
+
+# check_format 的错误类型对应的规则名和说明，供 --watch 的 JSON 输出使用
+FORMAT_RULES = {
+    "empty line error": (
+        "empty-line-after-code",
+        "A code block must be followed by an empty line.",
+    ),
+    "code error": (
+        "code-fence-indent-mismatch",
+        "The opening and closing code fences have different indentation.",
+    ),
+    "code indent error": ("code-fence-indent", "Code fences must not be indented."),
+    "code boundary empty line error": (
+        "empty-line-before-fence",
+        "A code block must not end with an empty line.",
+    ),
+    "latex error": (
+        "latex-fence-indent-mismatch",
+        "The opening and closing $$ have different indentation.",
+    ),
+    "list error": (
+        "list-without-empty-line",
+        "A list must be preceded by an empty line.",
+    ),
+    "quote error": (
+        "quote-without-empty-line",
+        "A quote must be preceded by an empty line.",
+    ),
+}
+
+
+def read_post(file_path):
+    """读取文章的全部行，保留原始换行符"""
+    with open(file_path, "r", encoding="utf-8", newline="") as file:
+        return file.readlines()
+
+
+def read_header(lines):
+    """从行的序列中取出YAML头部的文本，没有头部时返回 None
+
+    读到结束的 --- 就停止，lines 可以是打开的文件，正文不会被读入。
+    """
+    lines = iter(lines)
+    # 找到YAML头部
+    if next(lines, "").strip() != "---":
+        return None
+
+    header = []
+    for line in lines:
+        if line.strip() == "---":
+            break
+        header.append(line)
+    return "".join(header)
+
+
+def parse_header(lines):
+    """从文章的行中解析头部的YAML元数据"""
+    header_text = read_header(lines)
+    if header_text is None:
+        return {}
+    return parse_yaml(header_text)
+
+
+def read_yaml_header(file_path):
+    """读取Markdown文件头部的YAML元数据"""
+    with open(file_path, "r", encoding="utf-8", newline="") as file:
+        return parse_header(file)
+
+
+# 头部中顶层的键，如 "tags:"
+KEY_RE = re.compile(r"^([^\s#'\"-][^:]*?)\s*:(\s|$)")
+
+
+def header_key_lines(header_text):
+    """返回头部中每个顶层键所在的行号（第一行的 --- 是第 1 行）"""
+    key_lines = {}
+    for line_number, line in enumerate(header_text.splitlines(), start=2):
+        match = KEY_RE.match(line)
+        if match:
+            key_lines.setdefault(match.group(1), line_number)
+    return key_lines
+
+
+def parse_yaml(yaml_text):
+    """解析YAML文本并返回一个字典"""
+    return yaml.load(yaml_text, Loader=YAML_LOADER)
+
+
+def check_header(file_path, root_dir, header, key_lines=None):
+    """检查文件路径与分类是否匹配，并验证合法性
+
+    返回 [(级别, 信息, 规则, 行号)]，行号取自 key_lines（头部中各键的行号），
+    没有时为 1。
+    """
+    diagnostics = []
+    key_lines = key_lines or {}
+
+    def add(level, message, rule, key):
+        diagnostics.append((level, message, rule, key_lines.get(str(key), 1)))
+
+    relative_path = os.path.relpath(file_path, root_dir)
+    # 将相对路径分成目录和文件名
+    path_parts = os.path.dirname(relative_path).split(os.sep)
+
+    # 检查 YAML 中是否有不合法的项
+    for key in header.keys():
+        if key not in ALLOWED_YAML_KEYS:
+            add(
+                "warning",
+                f"Invalid YAML key '{key}' in file '{file_path}'. "
+                f"Allowed keys are: {', '.join(ALLOWED_YAML_KEYS)}.",
+                "invalid-key",
+                key,
+            )
+
+    if "categories" in header:
+        categories = header["categories"]
+
+        # 检查分类和路径部分的合法性
+        for part in path_parts + categories:
+            if not CATEGORY_RE.match(part):
+                add(
+                    "error",
+                    f"Invalid name '{part}' in file '{file_path}'. "
+                    f"Only lowercase letters and digits are allowed.",
+                    "category-name",
+                    "categories",
+                )
+
+        # 检查目录结构是否与分类列表匹配
+        if path_parts != categories:
+            add(
+                "error",
+                f"File '{file_path}' has categories {categories} but its path is '{relative_path}'.",
+                "category-path",
+                "categories",
+            )
+
+    # 检查tags的合法性
+    if "tags" in header:
+        if header["tags"]:
+            tags = header["tags"]
+
+            # 检查tags中的每个tag
+            for tag in tags:
+                if not TAG_RE.match(tag):
+                    add(
+                        "error",
+                        f"Invalid tag '{tag}' in file '{file_path}'. \n"
+                        f"Tags can only contain letters, numbers, hyphens, and underscores.",
+                        "tag-name",
+                        "tags",
+                    )
+        else:
+            add("error", f"Empty in tags in file '{file_path}'.", "empty-tags", "tags")
+
+    return diagnostics
+
+
+def find_posts(root_dir=ROOT_DIR):
+    # 目录和文件都按名称排序，输出顺序不依赖文件系统
+    posts = []
+    for root, dirs, files in os.walk(root_dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.endswith(".md"):
+                posts.append(os.path.join(root, file))
+    return posts
+
+
+def decode_post(data):
+    # 与 read_post 相同的解码方式，保留原始换行符
+    return io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", newline="")
+
+
+def header_error(file_path, e):
+    """把解析或检查头部时的异常转换成一条诊断"""
+    if isinstance(e, yaml.YAMLError):
+        mark = getattr(e, "problem_mark", None)
+        # 标记的行号从头部文本算起，且从 0 开始
+        line = 1 if mark is None else mark.line + 2
+        return (
+            "error",
+            f"Invalid YAML in file '{file_path}': {e}",
+            "yaml-syntax",
+            line,
+        )
+    return ("error", f"Cannot check file '{file_path}': {e}", "read-error", 1)
+
+
+def lint_post(
+    file_path, cached=None, root_dir=ROOT_DIR, body=True, head=True, strict=True
+):
+    """读取一次文章，返回 (正文错误, 头部诊断, 缓存条目)
+
+    cached 是上次的缓存条目。正文的结果以全文的哈希为键，头部的结果
+    以头部文本的哈希为键，哈希相同时直接复用；只检查头部时不读正文。
+    strict 为假时头部无法解析不抛出异常，而是作为头部诊断返回，正文的
+    结果照常保留；此时缓存条目中没有 meta，下次会重新检查头部。
+    """
+    entry = dict(cached) if cached else {}
+
+    lines = None
+    if body:
+        with open(file_path, "rb") as file:
+            data = file.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if entry.get("hash") != digest or "errors" not in entry:
+            lines = decode_post(data).readlines()
+            entry["hash"] = digest
+            entry["errors"] = check_format(lines)
+
+    if head:
+        if lines is not None:
+            header_text = read_header(lines)
+        elif body:
+            header_text = read_header(decode_post(data))
+        else:
+            with open(file_path, "r", encoding="utf-8", newline="") as file:
+                header_text = read_header(file)
+
+        key = "-" if header_text is None else "+" + header_text
+        header_hash = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        if (
+            entry.get("header_hash") != header_hash
+            or "diagnostics" not in entry
+            or "meta" not in entry
+        ):
+            try:
+                if header_text is None:
+                    header, key_lines = {}, {}
+                else:
+                    header = parse_yaml(header_text)
+                    key_lines = header_key_lines(header_text)
+                diagnostics = check_header(file_path, root_dir, header, key_lines)
+            except (yaml.YAMLError, TypeError, AttributeError) as e:
+                if strict:
+                    raise
+                entry.pop("header_hash", None)
+                entry.pop("meta", None)
+                entry["diagnostics"] = [header_error(file_path, e)]
+            else:
+                entry["header_hash"] = header_hash
+                entry["diagnostics"] = diagnostics
+                entry["meta"] = post_meta(header)
+
+    errors = [tuple(error) for error in entry.get("errors", [])] if body else []
+    diagnostics = [tuple(d) for d in entry.get("diagnostics", [])] if head else []
+    return errors, diagnostics, entry
+
+
+def lint_posts(
+    posts, cache, root_dir=ROOT_DIR, body=True, head=True, jobs=1, lint=lint_post
+):
+    """按 posts 的顺序返回每篇文章的结果，jobs 大于 1 时使用进程池"""
+    lint = functools.partial(lint, root_dir=root_dir, body=body, head=head)
+    cached = [cache.get(file_path) for file_path in posts]
+    if jobs <= 1 or len(posts) <= 1:
+        return map(lint, posts, cached)
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        chunksize = max(1, len(posts) // (jobs * 4))
+        return list(executor.map(lint, posts, cached, chunksize=chunksize))
+
+
+def rules_key():
+    # 规则版本之外，脚本中可修改的设置也会影响结果
+    return [RULES_VERSION, allow_code_indent, sorted(ALLOWED_YAML_KEYS)]
+
+
+def load_cache(cache_file):
+    try:
+        with open(cache_file, "r", encoding="utf-8") as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("rules") != rules_key():
+        return {}
+    return cache.get("posts", {})
+
+
+def write_json(file_path, data):
+    # 先写同目录下的临时文件再改名，中途出错不会留下写了一半的文件
+    folder = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=os.path.basename(file_path) + ".", dir=folder
+    )
+    try:
+        with open(fd, "w", encoding="utf-8") as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def save_cache(cache_file, posts):
+    write_json(cache_file, {"rules": rules_key(), "posts": posts})
+
+
+def as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [str(item) for item in value if item is not None]
+    return [str(value)]
+
+
+def post_meta(header):
+    """从头部中取出索引需要的项，转换成可以写入 JSON 的值"""
+    if not isinstance(header, dict):
+        header = {}
+    title = header.get("title")
+    abbrlink = header.get("abbrlink")
+    return {
+        "title": None if title is None else str(title),
+        "categories": as_list(header.get("categories")),
+        "tags": as_list(header.get("tags")),
+        "abbrlink": None if abbrlink is None else str(abbrlink),
+    }
+
+
+def read_post_meta(file_path):
+    with open(file_path, "r", encoding="utf-8", newline="") as file:
+        header_text = read_header(file)
+    return post_meta({} if header_text is None else parse_yaml(header_text))
+
+
+def load_index(index_file):
+    try:
+        with open(index_file, "r", encoding="utf-8") as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(index, dict) or index.get("version") != INDEX_VERSION:
+        return {}
+    return index.get("posts", {})
+
+
+def update_index(index, posts, metas=None):
+    """返回按 mtime 和大小更新后的索引 {路径: {"mtime", "size", "meta"}}
+
+    metas 是本次已经解析过的头部信息，其余发生变化的文章只读取头部。
+    已经删除的文章从索引中去掉。
+    """
+    metas = metas or {}
+    new_index = {}
+    for file_path in posts:
+        st = os.stat(file_path)
+        node = index.get(file_path)
+        if (
+            node is None
+            or node["mtime"] != st.st_mtime_ns
+            or node["size"] != st.st_size
+        ):
+            meta = metas.get(file_path)
+            if meta is None:
+                meta = read_post_meta(file_path)
+            node = {"mtime": st.st_mtime_ns, "size": st.st_size, "meta": meta}
+        new_index[file_path] = node
+    return new_index
+
+
+def save_index(index_file, index):
+    write_json(index_file, {"version": INDEX_VERSION, "posts": index})
+
+
+def tag_key(tag):
+    # 忽略大小写、空格、连字符和下划线后相同的标签视为重复
+    return re.sub(r"[\s_-]+", "", tag).casefold()
+
+
+def check_index(index):
+    """跨文章的检查：重复的 abbrlink 和近似重复的标签
+
+    返回 [(级别, 信息, 规则, 涉及的文章)]。
+    """
+    diagnostics = []
+
+    abbrlinks = {}
+    tags = {}
+    for file_path in sorted(index):
+        meta = index[file_path]["meta"]
+        if meta["abbrlink"] is not None:
+            abbrlinks.setdefault(meta["abbrlink"], []).append(file_path)
+        for tag in meta["tags"]:
+            tags.setdefault(tag_key(tag), {}).setdefault(tag, []).append(file_path)
+
+    for abbrlink, files in sorted(abbrlinks.items()):
+        if len(files) > 1:
+            diagnostics.append(
+                (
+                    "error",
+                    f"Duplicate abbrlink '{abbrlink}' in files "
+                    + ", ".join(f"'{file_path}'" for file_path in files)
+                    + ".",
+                    "duplicate-abbrlink",
+                    files,
+                )
+            )
+
+    for _, spellings in sorted(tags.items()):
+        if len(spellings) > 1:
+            diagnostics.append(
+                (
+                    "warning",
+                    "Similar tags "
+                    + ", ".join(
+                        f"'{tag}' ({len(files)} posts)"
+                        for tag, files in sorted(spellings.items())
+                    )
+                    + " should be merged.",
+                    "similar-tags",
+                    sorted(
+                        {
+                            file_path
+                            for files in spellings.values()
+                            for file_path in files
+                        }
+                    ),
+                )
+            )
+
+    return diagnostics
+
+
+class Reporter:
+    """按 blogcheck 和 headcheck 原来的格式输出结果并计数"""
+
+    def __init__(self):
+        self.format_error_count = 0
+        self.header_error_count = 0
+        self.warning_count = 0
+        self.show_error = True
+
+    def format_errors(self, md, errors):
+        if errors:
+            if not self.show_error:
+                print(f"- {len(errors)} errors in {md}")
+            for error in errors:
+                if self.show_error:
+                    print(f"[error {self.format_error_count+1}]:")
+                    print(f"[{error[3]}] at {md}:{error[0]}: \n{error[1]}{error[2]}")
+                self.format_error_count += 1
+        if self.format_error_count > 100 and self.show_error:
+            print("Too many errors...")
+            self.show_error = False
+
+    def format_summary(self):
+        if self.format_error_count == 0:
+            print("blogcheck: pass")
+
+    def header_diagnostics(self, diagnostics):
+        for level, message, *_ in diagnostics:
+            if level == "warning":
+                self.warning_count += 1
+                print(f"Warning[{self.warning_count}]: {message}")
+            else:
+                self.header_error_count += 1
+                print(f"Error[{self.header_error_count}]: {message}")
+
+    def header_summary(self):
+        if self.header_error_count == 0:
+            print("headcheck: pass")
+        else:
+            print(f"headcheck: {self.header_error_count} errors found.")
+
+        if self.warning_count > 0:
+            print(f"headcheck: {self.warning_count} warnings found.")
+
+
+def run(
+    body=True,
+    head=True,
+    root_dir=ROOT_DIR,
+    jobs=1,
+    cache_file=CACHE_FILE,
+    index_file=INDEX_FILE,
+):
+    """遍历一次目录、每篇文章只读一次，依次输出正文和头部的检查结果
+
+    检查头部时顺便更新索引并做跨文章的检查。cache_file、index_file
+    为 None 时不读写对应的文件。
+    """
+    reporter = Reporter()
+    header_results = []
+
+    cache = load_cache(cache_file) if cache_file else {}
+    new_cache = {}
+
+    posts = find_posts(root_dir)
+    for file_path, (errors, diagnostics, entry) in zip(
+        posts, lint_posts(posts, cache, root_dir, body, head, jobs)
+    ):
+        new_cache[file_path] = entry
+        if body:
+            reporter.format_errors(file_path, errors)
+        if head:
+            header_results.append(diagnostics)
+
+    if body:
+        reporter.format_summary()
+    if head:
+        for diagnostics in header_results:
+            reporter.header_diagnostics(diagnostics)
+
+        index = load_index(index_file) if index_file else {}
+        metas = {file_path: entry["meta"] for file_path, entry in new_cache.items()}
+        new_index = update_index(index, posts, metas)
+        reporter.header_diagnostics(check_index(new_index))
+        reporter.header_summary()
+
+        if index_file and new_index != index:
+            save_index(index_file, new_index)
+
+    if cache_file and new_cache != cache:
+        save_cache(cache_file, new_cache)
+
+    return reporter
+
+
+class InotifyWatcher:
+    """基于 inotify 的目录监视，递归监视所有子目录（仅 Linux）"""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_CLOEXEC = 0o2000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self, root_dir):
+        libc_name = ctypes.util.find_library("c")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.paths = {}
+        self.add_tree(root_dir)
+
+    def add_tree(self, folder):
+        """监视 folder 及其子目录，返回其中已有的文章"""
+        for root, dirs, files in os.walk(folder):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(root), self.MASK)
+            if wd >= 0:
+                self.paths[wd] = root
+        return set(find_posts(folder))
+
+    def poll(self, timeout):
+        """等待至多 timeout 秒（None 表示一直等待），返回变化的路径；
+        删除的文章和目录也在其中。事件队列溢出时返回 None，表示需要全量扫描"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        changed = set()
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & self.IN_Q_OVERFLOW:
+                return None
+            if mask & self.IN_IGNORED:
+                # 目录已被删除，监视随之失效
+                self.paths.pop(wd, None)
+                continue
+            if wd not in self.paths:
+                continue
+            path = os.path.join(self.paths[wd], os.fsdecode(name))
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    # 新目录需要补上监视，其中可能已经有文章
+                    changed |= self.add_tree(path)
+                else:
+                    changed.add(path)
+            elif path.endswith(".md") and not mask & self.IN_CREATE:
+                # 新建的文件在写完时还会有 IN_CLOSE_WRITE
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """定期比较文章的大小和 mtime，在没有 inotify 的系统上使用"""
+
+    def __init__(self, root_dir, interval=1.0):
+        self.root_dir = root_dir
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    def scan(self):
+        snapshot = {}
+        for file_path in find_posts(self.root_dir):
+            try:
+                st = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            snapshot[file_path] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def poll(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.interval
+            if deadline is not None:
+                wait = min(wait, max(0, deadline - time.monotonic()))
+            time.sleep(wait)
+
+            snapshot = self.scan()
+            changed = {
+                file_path
+                for file_path in snapshot.keys() | self.snapshot.keys()
+                if snapshot.get(file_path) != self.snapshot.get(file_path)
+            }
+            self.snapshot = snapshot
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+def make_watcher(root_dir):
+    try:
+        return InotifyWatcher(root_dir)
+    except (OSError, AttributeError, TypeError):
+        # 非 Linux 系统上 libc 中没有 inotify 函数；stdout 只输出 JSON
+        print("inotify is not available, falling back to polling.", file=sys.stderr)
+        return PollingWatcher(root_dir)
+
+
+def safe_lint_post(file_path, cached=None, root_dir=ROOT_DIR, body=True, head=True):
+    """与 lint_post 相同，但把读取和解析时的异常变成诊断，供 --watch 使用
+
+    编辑器保存到一半的文章不会让常驻进程退出：头部无法解析时正文的
+    错误照常返回，出错的头部结果不写入缓存，这篇文章暂时不进入索引。
+    文章已被删除时返回 None。
+    """
+    try:
+        return lint_post(file_path, cached, root_dir, body, head, strict=False)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        # 文件无法读取或解码，正文也无从检查
+        entry = dict(cached) if cached else {}
+        entry.pop("meta", None)
+        return [], [header_error(file_path, e)], entry
+
+
+def post_diagnostics(file_path, errors, diagnostics):
+    """把正文错误和头部诊断转换成 JSON 输出的格式"""
+    items = []
+    for line_number, _, _, kind in errors:
+        rule, message = FORMAT_RULES[kind]
+        items.append(
+            {
+                "file": file_path,
+                "line": line_number,
+                "rule": rule,
+                "level": "error",
+                "message": message,
+            }
+        )
+    for level, message, rule, line_number in diagnostics:
+        items.append(
+            {
+                "file": file_path,
+                "line": line_number,
+                "rule": rule,
+                "level": level,
+                "message": message,
+            }
+        )
+    return items
+
+
+def index_diagnostics(index):
+    """把跨文章检查的结果分给涉及的每篇文章，返回 {路径: [诊断]}"""
+    by_file = {}
+    for level, message, rule, files in check_index(index):
+        for file_path in files:
+            by_file.setdefault(file_path, []).append(
+                {
+                    "file": file_path,
+                    "line": 1,
+                    "rule": rule,
+                    "level": level,
+                    "message": message,
+                }
+            )
+    return by_file
+
+
+def index_node(file_path, entry):
+    st = os.stat(file_path)
+    return {"mtime": st.st_mtime_ns, "size": st.st_size, "meta": entry["meta"]}
+
+
+def watch(
+    body=True,
+    head=True,
+    root_dir=ROOT_DIR,
+    jobs=1,
+    cache_file=CACHE_FILE,
+    index_file=INDEX_FILE,
+):
+    """常驻运行：先检查全部文章，之后只重新检查发生变化的文章
+
+    每当一篇文章的诊断发生变化，就输出一行 JSON：
+    {"file": 路径, "diagnostics": [{"file", "line", "rule", "level", "message"}]}，
+    diagnostics 为空表示该文章的问题都已修正（或文章已被删除）。
+    启动时只输出有问题的文章。
+    """
+    # 先开始监视再做首次检查，检查期间的修改不会漏掉
+    watcher = make_watcher(root_dir)
+
+    cache = load_cache(cache_file) if cache_file else {}
+    results = {}
+    posts = find_posts(root_dir)
+    linted = lint_posts(posts, cache, root_dir, body, head, jobs, safe_lint_post)
+    for file_path, result in zip(posts, linted):
+        if result is not None:
+            results[file_path] = result
+
+    index = {}
+    if head:
+        index = load_index(index_file) if index_file else {}
+        metas = {
+            file_path: entry["meta"]
+            for file_path, (_, _, entry) in results.items()
+            if "meta" in entry
+        }
+        # 头部解析失败的文章不在 metas 中，不进入索引，以免 update_index 重新解析
+        index = update_index(index, list(metas), metas)
+    cross = index_diagnostics(index)
+
+    published = {}
+
+    def publish(file_paths):
+        for file_path in sorted(file_paths):
+            items = []
+            if file_path in results:
+                errors, diagnostics, _ = results[file_path]
+                items = post_diagnostics(file_path, errors, diagnostics)
+                items.extend(cross.get(file_path, []))
+            if items != published.get(file_path, []):
+                print(
+                    json.dumps(
+                        {"file": file_path, "diagnostics": items}, ensure_ascii=False
+                    ),
+                    flush=True,
+                )
+            if items:
+                published[file_path] = items
+            else:
+                published.pop(file_path, None)
+
+    def save():
+        if cache_file:
+            save_cache(
+                cache_file,
+                {file_path: entry for file_path, (_, _, entry) in results.items()},
+            )
+        if head and index_file:
+            save_index(index_file, index)
+
+    publish(results)
+    save()
+
+    try:
+        while True:
+            changed = watcher.poll(None)
+            # 编辑器保存时常常连续触发多个事件，等一小段时间合并成一批
+            while changed is not None:
+                more = watcher.poll(WATCH_DEBOUNCE)
+                if more is None:
+                    # 等待期间事件队列溢出，同样需要全量扫描
+                    changed = None
+                elif not more:
+                    break
+                else:
+                    changed |= more
+            if changed is None:
+                changed = set(find_posts(root_dir)) | set(results)
+
+            # 删除的目录展开成其中已检查过的文章
+            affected = set()
+            for path in changed:
+                if path.endswith(".md") and os.path.isfile(path):
+                    affected.add(path)
+                else:
+                    prefix = path + os.sep
+                    affected.update(
+                        file_path
+                        for file_path in results
+                        if file_path == path or file_path.startswith(prefix)
+                    )
+
+            for file_path in affected:
+                cached = results[file_path][2] if file_path in results else None
+                result = None
+                if os.path.isfile(file_path):
+                    result = safe_lint_post(file_path, cached, root_dir, body, head)
+                if result is None:
+                    results.pop(file_path, None)
+                    index.pop(file_path, None)
+                    continue
+                results[file_path] = result
+                if head and "meta" in result[2]:
+                    try:
+                        index[file_path] = index_node(file_path, result[2])
+                    except FileNotFoundError:
+                        index.pop(file_path, None)
+                else:
+                    index.pop(file_path, None)
+
+            old_cross = cross
+            cross = index_diagnostics(index)
+            publish(affected | old_cross.keys() | cross.keys())
+            save()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+def query_index(args, root_dir=ROOT_DIR):
+    """回答 --tag、--category 等查询，只读取有变化的文章的头部"""
+    index = load_index(args.index_file) if args.index_file else {}
+    new_index = update_index(index, find_posts(root_dir))
+    if args.index_file and new_index != index:
+        save_index(args.index_file, new_index)
+
+    metas = {file_path: node["meta"] for file_path, node in new_index.items()}
+
+    if args.tags or args.categories:
+        counts = {}
+        for meta in metas.values():
+            if args.tags:
+                names = meta["tags"]
+            else:
+                names = ["/".join(meta["categories"])] if meta["categories"] else []
+            for name in names:
+                counts[name] = counts.get(name, 0) + 1
+        for name, count in sorted(counts.items()):
+            print(f"{name}\t{count}")
+        return
+
+    for file_path, meta in sorted(metas.items()):
+        category = "/".join(meta["categories"])
+        if args.tag is not None and args.tag not in meta["tags"]:
+            continue
+        if args.category is not None and not (
+            category == args.category or category.startswith(args.category + "/")
+        ):
+            continue
+        if args.abbrlink is not None and meta["abbrlink"] != args.abbrlink:
+            continue
+        print(file_path)
+
+
+def parse_args(description, queries=False):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes (0 for one per CPU, default: 1)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Do not read or update {CACHE_FILE} and {INDEX_FILE}",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help=f"Keep running, re-check posts in {ROOT_DIR} when they change "
+        "and print diagnostics as JSON lines",
+    )
+    if queries:
+        group = parser.add_argument_group(
+            "queries", "Answer from the post index instead of checking"
+        )
+        group.add_argument("--tag", help="List posts with this tag")
+        group.add_argument(
+            "--category", help="List posts in this category (e.g. tech/python)"
+        )
+        group.add_argument("--abbrlink", help="List posts with this abbrlink")
+        group.add_argument(
+            "--tags", action="store_true", help="List all tags with post counts"
+        )
+        group.add_argument(
+            "--categories",
+            action="store_true",
+            help="List all categories with post counts",
+        )
+    args = parser.parse_args()
+    if args.jobs <= 0:
+        args.jobs = os.cpu_count() or 1
+    args.cache_file = None if args.no_cache else CACHE_FILE
+    args.index_file = None if args.no_cache else INDEX_FILE
+    return args
+
+
+def main():
+    args = parse_args("Check the format and front matter of blog posts.", True)
+    if any((args.tag, args.category, args.abbrlink, args.tags, args.categories)):
+        query_index(args)
+        return
+    if args.watch:
+        watch(jobs=args.jobs, cache_file=args.cache_file, index_file=args.index_file)
+        return
+
+    reporter = run(
+        jobs=args.jobs, cache_file=args.cache_file, index_file=args.index_file
+    )
+    # 退出码只有 8 位，256 的倍数会变成 0，deploy 脚本因此会误判为通过
+    sys.exit(min(reporter.format_error_count + reporter.header_error_count, 255))
+
+
+if __name__ == "__main__":
+    main()
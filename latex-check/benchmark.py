@@ -0,0 +1,235 @@
+"""latex-check 的基准测试
+
+生成一个合成的 .tex 语料，分别用旧的逐字符扫描和新的分词器检查，
+报告耗时、加速比以及两者结果不同的行数（不同之处来自旧实现对
+\\$、% 注释和 $$ 的误判）。
+
+--large 生成一个指定大小的表格型 .tex 文件，在子进程中分别以默认方式
+和 --stream 运行 latex-check（只检查，以及 --fix --yes），报告耗时和
+峰值 RSS。
+
+    python benchmark.py                     # 默认 200 个文件，每个 2000 行
+    python benchmark.py --files 50 --lines 20000
+    python benchmark.py --large 100         # 100 MB 的单个文件
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import resource
+import tempfile
+import contextlib
+import importlib.util
+import multiprocessing
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PROSE = (
+    "在本章中我们讨论有限维向量空间上的线性映射，并给出若干基本性质的证明。"
+    "这些结论在后续章节中会被反复使用，读者可以先略过证明。\n"
+)
+
+# (行, 权重)：大部分是不含公式的正文，与实际的论文、书稿接近
+SAMPLE_LINES = (
+    (PROSE, 30),
+    (
+        "In this section we prove the main theorem under weaker assumptions, "
+        "following the approach of the previous chapter closely.\n",
+        30,
+    ),
+    ("设 $x$ 为实数，则 $x^2 \\ge 0$，且等号当且仅当 $x = 0$ 时成立。\n", 8),
+    ("函数$f(x)$在区间上连续，因此在闭区间上取得最大值和最小值。\n", 2),
+    ("价格为 \\$5，数量为 $n$ 个，总价为 $5n$ 美元。\n", 2),
+    ("% 注释中的 $ 不是公式，例如 TODO: 补充 $\\alpha$ 的定义\n", 2),
+    ("$$\n", 2),
+    ("E = mc^2\n", 2),
+    ("由 $$a^2 + b^2 = c^2$$ 可得\n", 2),
+    ("其中 $a$和$b$ 是直角边，$c$ 是斜边。\n", 2),
+    ("\n", 18),
+)
+
+
+def load_latex_check():
+    """按路径导入 latex-check.py（文件名含连字符，不能直接 import）"""
+    spec = importlib.util.spec_from_file_location(
+        "latex_check", os.path.join(SCRIPT_DIR, "latex-check.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_check_lines(lines, punctuations):
+    """旧实现：逐字符找出 $ 的位置，按奇偶配对"""
+    errors = []
+
+    for line_number, line in enumerate(lines, start=1):
+        dollar_indices = [i for i, char in enumerate(line) if char == "$"]
+
+        for idx in range(len(dollar_indices)):
+            cur_idx = dollar_indices[idx]
+            if idx % 2 == 0:
+                if cur_idx > 0 and line[cur_idx - 1] not in punctuations:
+                    errors.append(
+                        (cur_idx, line_number, line, "Missing space before '$'")
+                    )
+            else:
+                if cur_idx < len(line) - 1 and line[cur_idx + 1] != "\n":
+                    if line[cur_idx + 1] not in punctuations:
+                        errors.append(
+                            (cur_idx, line_number, line, "Missing space after '$'")
+                        )
+
+    return errors[::-1]
+
+
+TABLE_ROWS = (
+    ("{i} & $0.{i}$ & $1.{i}$ & $2.{i}$ \\\\\n", 20),
+    ("{i} & $0.{i}$&$1.{i}$ & $2.{i}$ \\\\\n", 1),
+    ("% 第 {i} 行由脚本生成，单位 \\$\n", 1),
+)
+
+
+def make_large_file(path, size_mb, seed):
+    rng = random.Random(seed)
+    rows, weights = zip(*TABLE_ROWS)
+    size = size_mb * 1024 * 1024
+    written = 0
+    i = 0
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("\\begin{tabular}{cccc}\n")
+        while written < size:
+            chunk = "".join(
+                row.format(i=i + j)
+                for j, row in enumerate(rng.choices(rows, weights, k=1000))
+            )
+            file.write(chunk)
+            written += len(chunk)
+            i += 1000
+        file.write("\\end{tabular}\n")
+
+
+def peak_rss_mb():
+    """当前进程的峰值 RSS（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak / 1024 / 1024
+    return peak / 1024
+
+
+def run_checker(folder, flags, result_queue):
+    """在子进程中运行 latex-check，单独统计耗时和峰值 RSS"""
+    latex_check = load_latex_check()
+    os.chdir(folder)
+    sys.argv = ["latex-check.py", "--no-cache", *flags]
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            latex_check.main()
+        except SystemExit as e:
+            code = e.code
+    elapsed = time.perf_counter() - start
+    result_queue.put(
+        {"elapsed": elapsed, "peak_rss_mb": peak_rss_mb(), "exit_code": code}
+    )
+
+
+def bench_large(size_mb, seed):
+    modes = (
+        ("default", []),
+        ("stream", ["--stream"]),
+        ("default --fix", ["--fix", "--yes"]),
+        ("stream --fix", ["--stream", "--fix", "--yes"]),
+    )
+    print(f"{'mode':<15} {'seconds':>8} {'peak RSS MB':>12} {'errors':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "table.tex")
+        for name, flags in modes:
+            # --fix 会改写文件，每次都重新生成
+            make_large_file(path, size_mb, seed)
+            result_queue = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=run_checker, args=(folder, flags, result_queue)
+            )
+            process.start()
+            result = result_queue.get()
+            process.join()
+            print(
+                f"{name:<15} {result['elapsed']:>8.2f} "
+                f"{result['peak_rss_mb']:>12.1f} {result['exit_code']:>8}"
+            )
+
+
+def make_corpus(folder, files, lines_per_file, seed):
+    rng = random.Random(seed)
+    lines, weights = zip(*SAMPLE_LINES)
+    paths = []
+    for i in range(files):
+        path = os.path.join(folder, f"chapter{i:04d}.tex")
+        with open(path, "w", encoding="utf-8") as file:
+            file.writelines(rng.choices(lines, weights, k=lines_per_file))
+        paths.append(path)
+    return paths
+
+
+def bench(paths, check):
+    """返回 (耗时, 错误总数, 出错的行集合)，耗时包括读文件"""
+    start = time.perf_counter()
+    count = 0
+    flagged = set()
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as file:
+            lines = file.readlines()
+        errors = check(lines)
+        count += len(errors)
+        flagged.update((path, error[1]) for error in errors)
+    return time.perf_counter() - start, count, flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark latex-check.")
+    parser.add_argument("--files", type=int, default=200, help="Number of files")
+    parser.add_argument("--lines", type=int, default=2000, help="Lines per file")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument(
+        "--large",
+        type=int,
+        metavar="MB",
+        help="Benchmark time and peak RSS on a single generated file of this size",
+    )
+    args = parser.parse_args()
+
+    if args.large:
+        print(f"Large file: {args.large} MB")
+        bench_large(args.large, args.seed)
+        return
+
+    latex_check = load_latex_check()
+
+    with tempfile.TemporaryDirectory() as folder:
+        paths = make_corpus(folder, args.files, args.lines, args.seed)
+        size = sum(os.path.getsize(path) for path in paths) / 1024 / 1024
+        print(
+            f"Corpus: {args.files} files, {args.files * args.lines} lines, "
+            f"{size:.1f} MB"
+        )
+
+        legacy_time, legacy_count, legacy_lines = bench(
+            paths, lambda lines: legacy_check_lines(lines, latex_check.punctuations)
+        )
+        new_time, new_count, new_lines = bench(paths, latex_check.check_lines)
+
+    print(f"{'checker':<10} {'seconds':>8} {'errors':>8}")
+    print(f"{'legacy':<10} {legacy_time:>8.3f} {legacy_count:>8}")
+    print(f"{'tokenizer':<10} {new_time:>8.3f} {new_count:>8}")
+    print(f"Speedup: {legacy_time / new_time:.2f}x")
+    print(
+        f"Lines flagged only by legacy: {len(legacy_lines - new_lines)}, "
+        f"only by tokenizer: {len(new_lines - legacy_lines)}"
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
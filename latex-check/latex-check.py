@@ -1,9 +1,22 @@
+import io
 import os
+import re
 import sys
+import json
+import hashlib
+import collections
+import subprocess
 import argparse
+import tempfile
+import functools
+from concurrent.futures import ProcessPoolExecutor
 
 error_count = 0
 
+# 检查规则变化时加一，旧的缓存随之失效
+CHECKER_VERSION = 2
+CACHE_FILE = ".latex-check-cache"
+
 punctuations = (
     " ",
     "-",
@@ -29,78 +42,456 @@ punctuations = (
 )
 
 
-def check_dollar_sign_spacing(file_path):
-    global error_count
-    errors = []
+# 转义字符（包括 \$ 和 \\）、注释开始的 %、行间公式的 $$、行内公式的 $
+TOKEN_RE = re.compile(r"\\.|%|\$\$?")
 
-    with open(file_path, "r", encoding="utf-8") as file:
-        lines = file.readlines()
+TEXT, INLINE, DISPLAY = 0, 1, 2
 
-    for line_number, line in enumerate(lines, start=1):
-        dollar_indices = [i for i, char in enumerate(line) if char == "$"]
-
-        for idx in range(len(dollar_indices)):
-            cur_idx = dollar_indices[idx]
-            is_even_idx = idx % 2 == 0
-
-            # Check rules based on the index of the dollar sign
-            if is_even_idx:  # Even index (left dollar sign)
-                if cur_idx > 0:  # Not the first character
-                    if line[cur_idx - 1] not in punctuations:
-                        errors.append(
-                            (
-                                cur_idx,
-                                line_number,
-                                line,
-                                "Missing space before '$'",
-                            )
+# \input{a}、\input a、\include{a}、\subfile{a}，不匹配 \includegraphics 等
+INCLUDE_RE = re.compile(
+    r"\\(?:input|include|subfile)(?![A-Za-z])\s*(?:\{([^}]*)\}|([^\s{}%\\]+))"
+)
+COMMENT_RE = re.compile(r"(?<!\\)%.*")
+
+
+def scan_line(line, line_number, state, errors):
+    # 扫描含有 $ 的一行，把错误追加到 errors，返回行末的状态
+    for match in TOKEN_RE.finditer(line):
+        token = match.group()
+        if token[0] == "\\":
+            continue
+        if token == "%":
+            break
+
+        if state == DISPLAY:
+            if token == "$$":
+                state = TEXT
+            continue
+        if state == TEXT and token == "$$":
+            state = DISPLAY
+            continue
+
+        # 行内公式中的 $$ 是相邻的右、左两个定界符
+        for cur_idx in range(match.start(), match.end()):
+            if state == TEXT:  # left dollar sign
+                if cur_idx > 0 and line[cur_idx - 1] not in punctuations:
+                    errors.append(
+                        (
+                            cur_idx,
+                            line_number,
+                            line,
+                            "Missing space before '$'",
                         )
-            else:  # Odd index (right dollar sign)
+                    )
+                state = INLINE
+            else:  # right dollar sign
                 if (
-                    cur_idx < len(line) - 1 and line[cur_idx + 1] != "\n"
-                ):  # Not the last character
-                    if line[cur_idx + 1] not in punctuations:
-                        errors.append(
-                            (
-                                cur_idx,
-                                line_number,
-                                line,
-                                "Missing space after '$'",
-                            )
+                    cur_idx < len(line) - 1
+                    and line[cur_idx + 1] != "\n"
+                    and line[cur_idx + 1] not in punctuations
+                ):
+                    errors.append(
+                        (
+                            cur_idx,
+                            line_number,
+                            line,
+                            "Missing space after '$'",
                         )
+                    )
+                state = TEXT
+
+    return state
+
+
+def check_lines(lines):
+    errors = []
+    state = TEXT
+
+    for line_number, line in enumerate(lines, start=1):
+        if "$" in line:
+            state = scan_line(line, line_number, state, errors)
+        elif line.isspace():
+            # 空行结束段落，未闭合的公式不会延续到下一段
+            state = TEXT
 
     return errors[::-1]
 
 
-def fix_dollar_sign_spacing(file_path, lines, errors):
-    modified_lines = lines.copy()  # 复制原始行以便后续修改
+def stream_lines(lines):
+    """逐行产生 (行, 该行的错误)，只保留当前一行"""
+    state = TEXT
 
-    for line_number, line in enumerate(lines):
-        for error in errors:
-            if error[1] == line_number + 1:  # 对应的行
-                cur_idx = error[0]
-                is_even_idx = "before" in error[3]
-
-                # 根据索引进行修改
-                if is_even_idx:  # Even index (left dollar sign)
-                    modified_lines[line_number] = (
-                        modified_lines[line_number][:cur_idx]
-                        + " "
-                        + modified_lines[line_number][cur_idx:]
-                    )
-                else:  # Odd index (right dollar sign)
-                    modified_lines[line_number] = (
-                        modified_lines[line_number][: cur_idx + 1]
-                        + " "
-                        + modified_lines[line_number][cur_idx + 1 :]
+    for line_number, line in enumerate(lines, start=1):
+        errors = []
+        if "$" in line:
+            state = scan_line(line, line_number, state, errors)
+        elif line.isspace():
+            state = TEXT
+        yield line, errors
+
+
+def check_dollar_sign_spacing(file_path):
+    with open(file_path, "r", encoding="utf-8") as file:
+        lines = file.readlines()
+
+    return check_lines(lines)
+
+
+def check_file(file_path, cached=None, keep_lines=False):
+    """检查一个文件，返回 (行, 错误, 缓存条目)
+
+    需要修复时把读到的行一并返回，不必再读一次文件。cached 是上次的
+    缓存条目，内容哈希相同时直接复用其中的错误。
+    """
+    with open(file_path, "rb") as file:
+        data = file.read()
+    digest = hashlib.sha256(data).hexdigest()
+    hit = cached is not None and cached["hash"] == digest
+
+    lines = None
+    if not hit or cached["errors"] or keep_lines:
+        # 与 open(..., "r") 相同的解码和换行处理
+        lines = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8").readlines()
+
+    if hit:
+        errors = [
+            (cur_idx, line_number, lines[line_number - 1], message)
+            for cur_idx, line_number, message in cached["errors"]
+        ]
+    else:
+        errors = check_lines(lines)
+    entry = {
+        "hash": digest,
+        "errors": [[error[0], error[1], error[3]] for error in errors],
+    }
+
+    return (lines if keep_lines else None), errors, entry
+
+
+def load_cache(cache_file):
+    """返回 (检查结果, 依赖图)，缓存不存在或版本不符时都为空"""
+    try:
+        with open(cache_file, "r", encoding="utf-8") as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}, {}
+    if not isinstance(cache, dict) or cache.get("version") != CHECKER_VERSION:
+        return {}, {}
+    return cache.get("files", {}), cache.get("graph", {})
+
+
+def save_cache(cache_file, files, graph):
+    cache = {"version": CHECKER_VERSION, "files": files, "graph": graph}
+    write_atomic(cache_file, [json.dumps(cache, ensure_ascii=False)])
+
+
+def display_path(path):
+    # 与 os.walk(".") 得到的路径形式一致，作为缓存的键
+    path = os.path.relpath(path)
+    if path.startswith(".."):
+        return path
+    return os.path.join(".", path)
+
+
+def read_includes(file_path):
+    # 按出现顺序返回 \input、\include 和 \subfile 的参数，忽略注释中的
+    includes = []
+    with open(file_path, "r", encoding="utf-8") as file:
+        for line in file:
+            if "\\" not in line:
+                continue
+            if "%" in line:
+                line = COMMENT_RE.sub("", line)
+            for match in INCLUDE_RE.finditer(line):
+                includes.append((match.group(1) or match.group(2)).strip())
+    return includes
+
+
+def resolve_include(name, file_path, root_dir):
+    # 先相对根文件所在目录（与 TeX 一致），再相对当前文件所在目录（\subfile）
+    for base in (root_dir, os.path.dirname(file_path)):
+        path = os.path.join(base, name)
+        candidates = (path,) if path.endswith(".tex") else (path + ".tex", path)
+        for candidate in candidates:
+            if os.path.isfile(candidate):
+                return display_path(candidate)
+    return None
+
+
+def resolve_graph(roots, graph):
+    """按文档顺序返回从根文件可达的全部文件
+
+    graph 是缓存的依赖图 {路径: {"mtime": ..., "includes": [...]}}，
+    只有 mtime 变化的文件才重新读取。
+    """
+    reachable = []
+    seen = set()
+
+    for root in roots:
+        root = display_path(root)
+        root_dir = os.path.dirname(root)
+        stack = [root]
+        while stack:
+            file_path = stack.pop()
+            if file_path in seen:
+                continue
+            seen.add(file_path)
+            reachable.append(file_path)
+
+            mtime = os.stat(file_path).st_mtime_ns
+            node = graph.get(file_path)
+            if node is None or node["mtime"] != mtime:
+                node = {"mtime": mtime, "includes": read_includes(file_path)}
+                graph[file_path] = node
+
+            children = []
+            for name in node["includes"]:
+                child = resolve_include(name, file_path, root_dir)
+                if child is None:
+                    print(
+                        f"Warning: cannot resolve '{name}' included from {file_path}",
+                        file=sys.stderr,
                     )
+                elif child not in seen:
+                    children.append(child)
+            stack.extend(reversed(children))
+
+    return reachable
+
+
+def fix_line(line, errors):
+    # 从右往左插入空格，前面的下标不受影响；同一位置只插入一次
+    positions = set()
+    for cur_idx, _, _, message in errors:
+        if "before" in message:  # left dollar sign
+            positions.add(cur_idx)
+        else:  # right dollar sign
+            positions.add(cur_idx + 1)
+
+    pieces = []
+    end = len(line)
+    for pos in sorted(positions, reverse=True):
+        pieces.append(line[pos:end])
+        pieces.append(" ")
+        end = pos
+    pieces.append(line[:end])
+    return "".join(reversed(pieces))
+
+
+def apply_fixes(lines, errors):
+    # 按行分组，每行只重建一次
+    line_errors = {}
+    for error in errors:
+        line_errors.setdefault(error[1], []).append(error)
+
+    modified_lines = lines.copy()  # 复制原始行以便后续修改
+    for line_number, errors in line_errors.items():
+        modified_lines[line_number - 1] = fix_line(lines[line_number - 1], errors)
+
+    return modified_lines
+
+
+def unified_diff(file_path, pairs, context=3):
+    """由 (原行, 修改后的行) 序列逐个产生 unified diff 的行
+
+    修复只在行内插入空格、行数不变，直接按行对比生成 hunk，只缓存当前
+    hunk；difflib 对超过 200 行且有大量重复行的文件会把整个文件当作改动。
+    """
+
+    def diff_line(prefix, line):
+        if line.endswith("\n"):
+            return prefix + line
+        return prefix + line + "\n\\ No newline at end of file\n"
 
-    # 交互式确认更新
+    def format_hunk(start, hunk):
+        yield f"@@ -{start},{len(hunk)} +{start},{len(hunk)} @@\n"
+        removed, added = [], []
+        for old, new in hunk:
+            if old != new:
+                removed.append(diff_line("-", old))
+                added.append(diff_line("+", new))
+                continue
+            yield from removed
+            yield from added
+            removed, added = [], []
+            yield diff_line(" ", old)
+        yield from removed
+        yield from added
+
+    before = collections.deque(maxlen=context)
+    hunk = []
+    start = 0
+    trailing = 0
+    # git apply 不接受 ./main.tex 这样的路径
+    path = os.path.normpath(file_path).replace(os.sep, "/")
+    header = [f"--- a/{path}\n", f"+++ b/{path}\n"]
+
+    for line_number, (old, new) in enumerate(pairs, start=1):
+        if old != new:
+            if not hunk:
+                start = line_number - len(before)
+                hunk = [(line, line) for line in before]
+                before.clear()
+            hunk.append((old, new))
+            trailing = 0
+        elif hunk:
+            hunk.append((old, new))
+            trailing += 1
+            # 与下一处改动之间的上下文不会重叠，输出当前 hunk
+            if trailing > 2 * context:
+                yield from header
+                header = []
+                yield from format_hunk(start, hunk[: len(hunk) - trailing + context])
+                before.extend(line for line, _ in hunk[-context:])
+                hunk = []
+        else:
+            before.append(old)
+
+    if hunk:
+        yield from header
+        yield from format_hunk(
+            start, hunk[: len(hunk) - trailing + min(trailing, context)]
+        )
+
+
+def make_temp(file_path):
+    # 同一目录下的临时文件，保证之后的 os.replace 是原子的
+    folder = os.path.dirname(os.path.abspath(file_path))
+    return tempfile.mkstemp(
+        prefix="." + os.path.basename(file_path) + ".", suffix=".tmp", dir=folder
+    )
+
+
+def replace_file(tmp_path, file_path):
+    if os.path.exists(file_path):
+        os.chmod(tmp_path, os.stat(file_path).st_mode & 0o7777)
+    os.replace(tmp_path, file_path)
+
+
+def write_atomic(file_path, lines):
+    # 先写同目录下的临时文件再改名，中途出错不会留下写了一半的文件
+    fd, tmp_path = make_temp(file_path)
+    try:
+        with open(fd, "w", encoding="utf-8", newline="\n") as file:
+            file.writelines(lines)
+        replace_file(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def fix_dollar_sign_spacing(file_path, lines, errors, yes=False, diff=False, fix=True):
+    modified_lines = apply_fixes(lines, errors)
+
+    if diff:
+        sys.stdout.writelines(unified_diff(file_path, zip(lines, modified_lines)))
+    if not fix:
+        return
+
+    if not confirm_changes(file_path, yes):
+        return
+    write_atomic(file_path, modified_lines)
+    print(f"Changes saved for {file_path}.")
+
+
+def confirm_changes(file_path, yes):
+    # 交互式确认更新，--yes 时直接写入
+    if yes:
+        return True
     confirm = input(f"Confirm changes for {file_path}? (y/n): ")
-    if confirm.lower() == "y":
-        with open(file_path, "w", encoding="utf-8", newline="\n") as file:
-            file.writelines(modified_lines)
-        print(f"Changes saved for {file_path}.")
+    return confirm.lower() == "y"
+
+
+def print_error(file_path, error):
+    global error_count
+    error_count += 1
+    print(f"[error {error_count}]: {error[3]} at {file_path}:{error[1]} ({error[0]})")
+
+
+def stream_file(file_path, yes=False, diff=False, fix=False):
+    """逐行检查一个文件并立即输出错误，内存占用与文件大小无关
+
+    错误按行号从小到大输出。修复时把改过的行写入同目录的临时文件，
+    扫描结束并确认后再替换原文件。
+    """
+    count = error_count
+
+    def pairs(file, output):
+        for line, errors in stream_lines(file):
+            for error in errors:
+                print_error(file_path, error)
+            new_line = fix_line(line, errors) if errors else line
+            if output is not None:
+                output.write(new_line)
+            yield line, new_line
+
+    fd, tmp_path = make_temp(file_path) if fix else (None, None)
+    try:
+        output = open(fd, "w", encoding="utf-8", newline="\n") if fix else None
+        with open(file_path, "r", encoding="utf-8") as file:
+            if diff:
+                for diff_line in unified_diff(file_path, pairs(file, output)):
+                    sys.stdout.write(diff_line)
+            else:
+                collections.deque(pairs(file, output), maxlen=0)
+        if output is not None:
+            output.close()
+
+        if fix and error_count > count and confirm_changes(file_path, yes):
+            replace_file(tmp_path, file_path)
+            tmp_path = None
+            print(f"Changes saved for {file_path}.")
+    finally:
+        if tmp_path is not None:
+            os.unlink(tmp_path)
+
+
+def find_tex_files(top="."):
+    tex_files = []
+    for root, _, files in os.walk(top):
+        for file in files:
+            if file.endswith(".tex"):
+                tex_files.append(os.path.join(root, file))
+    return tex_files
+
+
+def find_changed_files():
+    # 工作区中修改过的和已暂存的 .tex 文件，路径相对于当前目录
+    names = set()
+    for extra in ([], ["--cached"]):
+        output = subprocess.run(
+            ["git", "diff", "--name-only", "--relative", *extra],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        names.update(output.splitlines())
+
+    return [
+        os.path.join(".", name)
+        for name in sorted(names)
+        if name.endswith(".tex") and os.path.isfile(name)
+    ]
+
+
+def check_files(tex_files, jobs=1, keep_lines=False, cache=None):
+    """按 tex_files 的顺序逐个返回 (路径, 行, 错误, 缓存条目)
+
+    并行时输出顺序和错误编号也保持不变。
+    """
+    check = functools.partial(check_file, keep_lines=keep_lines)
+    cache = cache or {}
+    cached = [cache.get(tex_file_path) for tex_file_path in tex_files]
+    if jobs <= 1 or len(tex_files) <= 1:
+        for tex_file_path, entry in zip(tex_files, cached):
+            yield (tex_file_path, *check(tex_file_path, entry))
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        chunksize = max(1, len(tex_files) // (jobs * 4))
+        results = executor.map(check, tex_files, cached, chunksize=chunksize)
+        for tex_file_path, result in zip(tex_files, results):
+            yield (tex_file_path, *result)
 
 
 def main():
@@ -111,29 +502,101 @@ def main():
     parser.add_argument(
         "--fix", action="store_true", help="Interactively fix spacing issues"
     )
+    parser.add_argument(
+        "-y", "--yes", action="store_true", help="With --fix, save without asking"
+    )
+    parser.add_argument(
+        "--diff", action="store_true", help="Print the fixes as a unified diff"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes (0 for one per CPU, default: 1)",
+    )
+    parser.add_argument(
+        "--changed",
+        action="store_true",
+        help="Only check .tex files that git reports as modified or staged",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Do not read or update {CACHE_FILE}",
+    )
+    parser.add_argument(
+        "--root",
+        action="append",
+        metavar="FILE",
+        help="Only check files reachable from this document through "
+        "\\input, \\include and \\subfile (can be repeated)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Scan files line by line with constant memory "
+        "(for very large files; ignores --jobs and the cache)",
+    )
     args = parser.parse_args()
 
-    for root, _, files in os.walk("."):
-        for file in files:
-            if file.endswith(".tex"):
-                tex_file_path = os.path.join(root, file)
-                print(f"Checking spacing for: {tex_file_path}")
-                errors = check_dollar_sign_spacing(tex_file_path)
-
-                if errors:
-                    for error in errors:
-                        print(
-                            f"[error {error_count + 1}]: "
-                            f"{error[3]} at {tex_file_path}:{error[1]} ({error[0]})"
-                        )
-                        error_count += 1
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
 
-                    if args.fix:
-                        fix_dollar_sign_spacing(
-                            tex_file_path,
-                            open(tex_file_path, "r", encoding="utf-8").readlines(),
-                            errors,
-                        )
+    cache, graph = ({}, {}) if args.no_cache else load_cache(CACHE_FILE)
+    new_graph = dict(graph)
+
+    if args.root:
+        for root in args.root:
+            if not os.path.isfile(root):
+                parser.error(f"root document not found: {root}")
+        tex_files = resolve_graph(args.root, new_graph)
+    else:
+        tex_files = find_tex_files(".")
+
+    if args.changed:
+        try:
+            changed_files = find_changed_files()
+        except (OSError, subprocess.CalledProcessError) as e:
+            parser.error(f"--changed needs a git work tree: {e}")
+        if args.root:
+            changed_files = set(changed_files)
+            tex_files = [path for path in tex_files if path in changed_files]
+        else:
+            tex_files = changed_files
+
+    if args.stream:
+        for tex_file_path in tex_files:
+            print(f"Checking spacing for: {tex_file_path}")
+            stream_file(tex_file_path, args.yes, args.diff, args.fix)
+
+        if not args.no_cache and new_graph != graph:
+            save_cache(CACHE_FILE, cache, new_graph)
+
+        if error_count == 0:
+            print("latex-check: pass")
+        sys.exit(error_count)
+
+    # 完整检查时顺便清掉已经不存在的文件，只检查部分文件时保留其它条目
+    new_cache = dict(cache) if args.changed or args.root else {}
+
+    keep_lines = args.fix or args.diff
+    for tex_file_path, lines, errors, entry in check_files(
+        tex_files, jobs, keep_lines, cache
+    ):
+        new_cache[tex_file_path] = entry
+        print(f"Checking spacing for: {tex_file_path}")
+
+        if errors:
+            for error in errors:
+                print_error(tex_file_path, error)
+
+            if keep_lines:
+                fix_dollar_sign_spacing(
+                    tex_file_path, lines, errors, args.yes, args.diff, args.fix
+                )
+
+    if not args.no_cache and (new_cache != cache or new_graph != graph):
+        save_cache(CACHE_FILE, new_cache, new_graph)
 
     if error_count == 0:
         print("latex-check: pass")
@@ -0,0 +1,454 @@
+"""webdav-sync 的本地基准测试
+
+在回环地址上启动一个兼容 WebDAV 的 HTTP(S) 服务器（运行在子进程中，
+只记录文件元数据、丢弃文件内容），可选注入每个请求的延迟；然后生成
+测试目录，在独立的子进程中运行 sync_with_webdav，报告 files/s、MB/s、
+请求数和客户端峰值 RSS。
+
+    python benchmark.py                       # 全部场景
+    python benchmark.py -s small -j 1 4 16    # 对比不同并发数
+    python benchmark.py -s large --size 1024  # 大文件内存占用
+    python benchmark.py --latency 20 --tls    # 模拟远程 HTTPS 服务器
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+import contextlib
+import http.client
+import http.server
+import email.utils
+import importlib.util
+import multiprocessing
+from urllib.parse import urlparse, quote, unquote
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SCENARIOS = ("small", "large", "deep")
+
+
+def load_webdav_sync():
+    """按路径导入 webdav-sync.py（文件名含连字符，不能直接 import）"""
+    spec = importlib.util.spec_from_file_location(
+        "webdav_sync", os.path.join(SCRIPT_DIR, "webdav-sync.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    """支持 PUT/MKCOL/PROPFIND/COPY/HEAD 的最小 WebDAV 服务器
+
+    文件内容读完即丢弃，只保存大小、修改时间和 ETag。父目录不存在时
+    PUT 和 MKCOL 返回 409，与真实服务器一致。GET /__stats 返回按方法
+    统计的请求数和收到的字节数，GET /__stats?reset=1 同时清零。
+    """
+
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    files = {}
+    collections = {""}
+    stats = {"requests": {}, "bytes": 0, "connections": 0}
+    lock = threading.Lock()
+    counter = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.lock:
+            self.stats["connections"] += 1
+
+    def reply(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def path_of(self, url):
+        return unquote(urlparse(url).path).strip("/")
+
+    def count(self, received=0):
+        with self.lock:
+            requests = self.stats["requests"]
+            requests[self.command] = requests.get(self.command, 0) + 1
+            self.stats["bytes"] += received
+        if self.latency:
+            time.sleep(self.latency)
+
+    def discard_body(self):
+        remaining = int(self.headers.get("Content-Length", 0))
+        received = 0
+        while remaining > 0:
+            block = self.rfile.read(min(remaining, 1024 * 1024))
+            if not block:
+                break
+            received += len(block)
+            remaining -= len(block)
+        return received
+
+    def do_PUT(self):
+        received = self.discard_body()
+        self.count(received)
+        path = self.path_of(self.path)
+        if os.path.dirname(path) not in self.collections:
+            return self.reply(409)
+        with self.lock:
+            StandInHandler.counter += 1
+            etag = f'"{StandInHandler.counter}"'
+            self.files[path] = (received, time.time(), etag)
+        self.reply(201, headers={"ETag": etag})
+
+    def do_MKCOL(self):
+        self.discard_body()
+        self.count()
+        path = self.path_of(self.path)
+        with self.lock:
+            if path in self.collections or path in self.files:
+                return self.reply(405)
+            if os.path.dirname(path) not in self.collections:
+                return self.reply(409)
+            self.collections.add(path)
+        self.reply(201)
+
+    def do_COPY(self):
+        self.count()
+        source = self.path_of(self.path)
+        destination = self.path_of(self.headers["Destination"])
+        with self.lock:
+            if source not in self.files:
+                return self.reply(404)
+            if os.path.dirname(destination) not in self.collections:
+                return self.reply(409)
+            size, _, etag = self.files[source]
+            self.files[destination] = (size, time.time(), etag)
+        self.reply(201)
+
+    def do_HEAD(self):
+        self.count()
+        path = self.path_of(self.path)
+        if path not in self.files:
+            return self.reply(404)
+        self.send_response(200)
+        self.send_header("Content-Length", str(self.files[path][0]))
+        self.end_headers()
+
+    def do_PROPFIND(self):
+        self.discard_body()
+        self.count()
+        path = self.path_of(self.path)
+        if path not in self.collections:
+            return self.reply(404)
+
+        def response(name, props):
+            href = quote("/" + name + ("/" if name in self.collections else ""))
+            return (
+                f"<d:response><d:href>{href}</d:href><d:propstat><d:prop>{props}"
+                "</d:prop><d:status>HTTP/1.1 200 OK</d:status></d:propstat>"
+                "</d:response>"
+            )
+
+        parts = ['<?xml version="1.0" encoding="utf-8"?><d:multistatus xmlns:d="DAV:">']
+        collection = "<d:resourcetype><d:collection/></d:resourcetype>"
+        with self.lock:
+            parts.append(response(path, collection))
+            for name in self.collections:
+                if name and os.path.dirname(name) == path:
+                    parts.append(response(name, collection))
+            for name, (size, mtime, etag) in self.files.items():
+                if os.path.dirname(name) == path:
+                    props = (
+                        f"<d:resourcetype/><d:getcontentlength>{size}"
+                        "</d:getcontentlength><d:getlastmodified>"
+                        f"{email.utils.formatdate(mtime, usegmt=True)}"
+                        f"</d:getlastmodified><d:getetag>{etag}</d:getetag>"
+                    )
+                    parts.append(response(name, props))
+        parts.append("</d:multistatus>")
+        self.reply(207, "".join(parts).encode())
+
+    def do_GET(self):
+        if not self.path.startswith("/__stats"):
+            return self.reply(404)
+        with self.lock:
+            body = json.dumps(self.stats).encode()
+            if self.path.endswith("reset=1"):
+                self.stats["requests"] = {}
+                self.stats["bytes"] = 0
+                self.stats["connections"] = 0
+        self.reply(200, body)
+
+
+def serve(port_queue, latency, certfile):
+    StandInHandler.latency = latency
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    if certfile:
+        import ssl
+
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+def start_server(latency=0.0, certfile=None):
+    """在子进程中启动服务器，返回 (进程, 端口)"""
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=serve, args=(port_queue, latency, certfile), daemon=True
+    )
+    process.start()
+    return process, port_queue.get()
+
+
+def make_certificate(folder):
+    """用 openssl 生成 localhost 的自签名证书，返回证书路径"""
+    certfile = os.path.join(folder, "localhost.pem")
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=127.0.0.1",
+            "-addext",
+            "subjectAltName=IP:127.0.0.1",
+            "-keyout",
+            certfile,
+            "-out",
+            certfile,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return certfile
+
+
+def server_stats(port, certfile=None, reset=False):
+    if certfile:
+        import ssl
+
+        context = ssl.create_default_context(cafile=certfile)
+        conn = http.client.HTTPSConnection("127.0.0.1", port, context=context)
+    else:
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request("GET", "/__stats?reset=1" if reset else "/__stats")
+    stats = json.loads(conn.getresponse().read())
+    conn.close()
+    return stats
+
+
+def peak_rss_mb():
+    """当前进程的峰值 RSS（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak / 1024 / 1024
+    return peak / 1024
+
+
+def make_large_file(path, size):
+    """生成指定大小的稀疏文件，不占用实际磁盘空间"""
+    with open(path, "wb") as f:
+        f.truncate(size)
+
+
+def make_tree(folder, scenario, files, size_mb):
+    """生成测试目录，返回 (文件数, 总字节数)"""
+    total = 0
+    if scenario == "small":
+        # 大量小 Markdown 文件，平铺在少数几个目录中
+        for i in range(files):
+            directory = os.path.join(folder, f"dir{i % 10}")
+            os.makedirs(directory, exist_ok=True)
+            content = f"# note {i}\n\n" + "lorem ipsum " * (i % 200)
+            with open(os.path.join(directory, f"note{i}.md"), "w") as f:
+                f.write(content)
+            total += len(content)
+        return files, total
+
+    if scenario == "large":
+        # 少量大文件
+        count = 2
+        for i in range(count):
+            make_large_file(
+                os.path.join(folder, f"large{i}.pdf"), size_mb * 1024 * 1024
+            )
+            total += size_mb * 1024 * 1024
+        return count, total
+
+    # 深层嵌套的目录树，每层一个文件
+    depth = 12
+    for branch in range(max(1, files // depth)):
+        directory = os.path.join(folder, f"branch{branch}")
+        for level in range(depth):
+            directory = os.path.join(directory, f"level{level}")
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, "page.md"), "w") as f:
+                f.write(f"{branch}/{level}\n")
+            total += len(f"{branch}/{level}\n")
+    return max(1, files // depth) * depth, total
+
+
+def run_sync(config, jobs, result_queue):
+    """在子进程中同步，单独统计客户端的耗时和峰值 RSS"""
+    webdav_sync = load_webdav_sync()
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        progress = webdav_sync.sync_with_webdav(config, jobs)
+    elapsed = time.perf_counter() - start
+    result_queue.put(
+        {
+            "elapsed": elapsed,
+            "peak_rss_mb": peak_rss_mb(),
+            "success": progress.success_count,
+            "failed": progress.failure_count,
+        }
+    )
+
+
+def bench(scenario, jobs, port, args, certfile):
+    with tempfile.TemporaryDirectory() as folder:
+        files, total = make_tree(folder, scenario, args.files, args.size)
+        scheme = "https" if certfile else "http"
+        base = f"bench-{scenario}-{jobs}-{time.monotonic_ns()}"
+        config = {
+            "local_folder": folder,
+            "webdav_url": f"{scheme}://127.0.0.1:{port}/{base}/",
+            "username": "bench",
+            "password": "bench",
+            "include_extensions": [".md", ".pdf"],
+            "cafile": certfile,
+        }
+
+        webdav_sync = load_webdav_sync()
+        client = webdav_sync.WebDAVClient(
+            urlparse(config["webdav_url"]),
+            "",
+            context=webdav_sync.ssl.create_default_context(cafile=certfile),
+        )
+        client.request("MKCOL", f"/{base}/")
+        client.close()
+        server_stats(port, certfile, reset=True)
+
+        result_queue = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=run_sync, args=(config, jobs, result_queue)
+        )
+        process.start()
+        result = result_queue.get()
+        process.join()
+
+    stats = server_stats(port, certfile)
+    elapsed = result["elapsed"]
+    return {
+        "scenario": scenario,
+        "jobs": jobs,
+        "files": files,
+        "bytes": total,
+        "elapsed": elapsed,
+        "files_per_s": files / elapsed,
+        "mb_per_s": total / 1024 / 1024 / elapsed,
+        "requests": sum(stats["requests"].values()),
+        "requests_by_method": stats["requests"],
+        "connections": stats["connections"],
+        "peak_rss_mb": result["peak_rss_mb"],
+        "failed": result["failed"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark webdav-sync locally.")
+    parser.add_argument(
+        "-s",
+        "--scenario",
+        choices=SCENARIOS + ("all",),
+        default="all",
+        help="Synthetic tree to upload (default: all)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        nargs="+",
+        default=[1, 4],
+        help="Values of --jobs to compare (default: 1 4)",
+    )
+    parser.add_argument(
+        "--files",
+        type=int,
+        default=2000,
+        help="Number of files for the small and deep scenarios (default: 2000)",
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=256,
+        help="Size of each file in the large scenario in MB (default: 256)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Latency injected by the server per request in ms (default: 0)",
+    )
+    parser.add_argument(
+        "--tls", action="store_true", help="Serve HTTPS with a self-signed certificate"
+    )
+    parser.add_argument("--json", type=str, help="Also write the results to a file")
+    args = parser.parse_args()
+
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    cert_folder = tempfile.mkdtemp()
+    certfile = make_certificate(cert_folder) if args.tls else None
+    process, port = start_server(args.latency / 1000, certfile)
+
+    results = []
+    try:
+        print(
+            f"{'scenario':<8} {'jobs':>4} {'files':>6} {'MB':>8} {'time/s':>8} "
+            f"{'files/s':>9} {'MB/s':>8} {'requests':>8} {'conns':>6} {'RSS/MB':>7}"
+        )
+        for scenario in scenarios:
+            for jobs in args.jobs:
+                r = bench(scenario, jobs, port, args, certfile)
+                results.append(r)
+                print(
+                    f"{r['scenario']:<8} {r['jobs']:>4} {r['files']:>6} "
+                    f"{r['bytes'] / 1024 / 1024:>8.1f} {r['elapsed']:>8.2f} "
+                    f"{r['files_per_s']:>9.1f} {r['mb_per_s']:>8.1f} "
+                    f"{r['requests']:>8} {r['connections']:>6} "
+                    f"{r['peak_rss_mb']:>7.1f}"
+                )
+                if r["failed"]:
+                    print(f"  warning: {r['failed']} uploads failed")
+    finally:
+        process.terminate()
+        shutil.rmtree(cert_folder)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
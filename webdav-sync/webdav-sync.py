@@ -1,10 +1,38 @@
 import os
 import http.client
 import json
-from urllib.parse import urlparse
+import math
+from urllib.parse import urlparse, urlunparse, quote, unquote
 import base64
 import sys
 import argparse
+import threading
+import hashlib
+import collections
+import posixpath
+import email.utils
+import xml.etree.ElementTree as ET
+import heapq
+import itertools
+import random
+import time
+import ctypes
+import ctypes.util
+import select
+import struct
+import concurrent.futures
+import ssl
+import fnmatch
+import re
+
+# 多个线程同时输出时，保证每行完整
+output_lock = threading.Lock()
+
+
+def log(message):
+    with output_lock:
+        sys.stdout.write(f"{message}\n")
+        sys.stdout.flush()
 
 
 def load_config(config_file):
@@ -13,67 +41,1468 @@ def load_config(config_file):
         return json.load(f)
 
 
-def sync_with_webdav(config):
-    """将指定后缀的文件同步到 WebDAV 服务器"""
-    parsed_url = urlparse(config["webdav_url"])
-    credentials = f"{config['username']}:{config['password']}"
-    encoded_credentials = base64.b64encode(credentials.encode()).decode()
-    files_to_upload = []
+def load_manifest(manifest_file, webdav_url=None):
+    """加载上次同步的清单，不存在或损坏时返回空清单
+
+    清单记录了同步的目标 webdav_url，目标变化（换了服务器或目录）时
+    清单中的文件和目录都不再可信，同样返回空清单。没有记录目标的旧清单
+    仍然沿用，下次保存时补上。
+    """
+    empty = {"files": {}, "webdav_url": webdav_url}
+    try:
+        with open(manifest_file, "r") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return empty
+    recorded = manifest.get("webdav_url")
+    if webdav_url is not None and recorded is not None and recorded != webdav_url:
+        return empty
+    manifest.setdefault("files", {})
+    manifest["webdav_url"] = webdav_url
+    return manifest
+
+
+def save_manifest(manifest_file, manifest):
+    """先写临时文件再替换，避免中断时留下半个清单"""
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_file)), exist_ok=True)
+    tmp_file = f"{manifest_file}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_file, manifest_file)
+
+
+def file_hash(local_path):
+    """计算文件内容的 SHA-256"""
+    h = hashlib.sha256()
+    with open(local_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_state(local_path, old_entry, use_hash):
+    """返回 (当前状态, 是否有变化)，只在大小相同而 mtime 不同时才计算哈希"""
+    st = os.stat(local_path)
+    entry = {"size": st.st_size, "mtime": st.st_mtime_ns}
+    if old_entry is None or old_entry.get("size") != st.st_size:
+        if use_hash:
+            entry["hash"] = file_hash(local_path)
+        return entry, True
+
+    if old_entry.get("mtime") == st.st_mtime_ns:
+        if "hash" in old_entry:
+            entry["hash"] = old_entry["hash"]
+        return entry, False
+
+    if use_hash:
+        entry["hash"] = file_hash(local_path)
+        return entry, entry["hash"] != old_entry.get("hash")
+    return entry, True
+
+
+# 上传时每次从文件读取并发送的块大小
+BLOCK_SIZE = 256 * 1024
+
+# 可以重试的 HTTP 状态码
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+# 断点续传时每段的大小，每段上传后都会用 HEAD 确认服务器实际写入的长度
+SEGMENT_SIZE = 64 * 1024 * 1024
+
+Response = collections.namedtuple("Response", ["status", "reason", "headers", "body"])
+
+PROPFIND_BODY = b"""<?xml version="1.0" encoding="utf-8"?>
+<d:propfind xmlns:d="DAV:">
+  <d:prop>
+    <d:resourcetype/>
+    <d:getcontentlength/>
+    <d:getlastmodified/>
+    <d:getetag/>
+  </d:prop>
+</d:propfind>
+"""
+
+
+class WebDAVClient:
+    """持有一个 keep-alive 连接的 WebDAV 客户端，服务器断开时自动重连"""
+
+    def __init__(
+        self, parsed_url, encoded_credentials, timeout=60, slots=None, context=None
+    ):
+        self.netloc = parsed_url.netloc
+        self.timeout = timeout
+        # 同一主机共享的连接数信号量，建立连接时占用，关闭时归还
+        self.slots = slots
+        if parsed_url.scheme == "http":
+            self.connection_class = http.client.HTTPConnection
+            self.connection_options = {}
+        else:
+            self.connection_class = http.client.HTTPSConnection
+            self.connection_options = {"context": context}
+        self.headers = {
+            "Authorization": f"Basic {encoded_credentials}",
+            "User-Agent": "Python-WebDAV-Sync",
+        }
+        self.conn = None
+        # 用于统计连接复用情况
+        self.connections = 0
+        self.requests = 0
+
+    def connect(self):
+        if self.slots is not None:
+            self.slots.acquire()
+        self.connections += 1
+        self.conn = self.connection_class(
+            self.netloc,
+            timeout=self.timeout,
+            blocksize=BLOCK_SIZE,
+            **self.connection_options,
+        )
+        return self.conn
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+            if self.slots is not None:
+                self.slots.release()
+
+    def request(self, method, path, body=None, headers=None):
+        """发送请求并读完响应体，返回 Response"""
+        all_headers = dict(self.headers)
+        if headers:
+            all_headers.update(headers)
+
+        # 文件对象作为请求体时由 http.client 按块流式发送，重试前需回到起点
+        start = body.tell() if hasattr(body, "tell") else None
 
-    for root, dirs, files in os.walk(config["local_folder"]):
-        for file in files:
-            if any(file.endswith(ext) for ext in config["include_extensions"]):
-                local_path = os.path.join(root, file)
-                remote_path = os.path.join(
-                    parsed_url.path, os.path.relpath(local_path, config["local_folder"])
-                ).replace("\\", "/")
-                files_to_upload.append((local_path, remote_path))
-
-    total_files = len(files_to_upload)
-    success_count = 0
-    failure_count = 0
-    failure_details = []
-
-    for local_path, remote_path in files_to_upload:
+        # 复用的连接可能已被服务器关闭，此时重连后再试一次
+        for attempt in range(2):
+            reused = self.conn is not None
+            conn = self.conn if reused else self.connect()
+            self.requests += 1
+            try:
+                conn.request(method, path, body, all_headers)
+                response = conn.getresponse()
+                data = response.read()  # 必须读完响应体才能复用连接
+            except (
+                http.client.RemoteDisconnected,
+                ConnectionResetError,
+                BrokenPipeError,
+            ):
+                self.close()
+                if reused and attempt == 0:
+                    if start is not None:
+                        body.seek(start)
+                    continue
+                raise
+            except Exception:
+                self.close()
+                raise
+
+            if response.will_close:
+                self.close()
+            return Response(response.status, response.reason, response.headers, data)
+
+    def put_file(self, local_path, remote_path):
+        """流式上传文件，内存占用与文件大小无关
+
+        只发送打开时的 size 字节：上传期间文件变长时，多出的内容不能
+        混进连接，成为下一个请求的开头。
+        """
+        with open(local_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            headers = {"Content-Length": str(size)}
+            return self.request("PUT", remote_path, FileSegment(f, size), headers)
+
+    def put_segment(self, local_path, remote_path, offset, length, size):
+        """用 Content-Range 上传文件中的一段"""
         with open(local_path, "rb") as f:
-            conn = http.client.HTTPSConnection(parsed_url.netloc)
+            f.seek(offset)
             headers = {
-                "Authorization": f"Basic {encoded_credentials}",
-                "User-Agent": "Python-WebDAV-Sync",
+                "Content-Length": str(length),
+                "Content-Range": f"bytes {offset}-{offset + length - 1}/{size}",
             }
+            return self.request("PUT", remote_path, FileSegment(f, length), headers)
+
+    def remote_size(self, remote_path):
+        """返回远端文件长度，不存在时返回 None"""
+        response = self.request("HEAD", remote_path)
+        if response.status != 200:
+            return None
+        length = response.headers.get("Content-Length")
+        return int(length) if length is not None else None
+
+
+class FileSegment:
+    """只暴露文件中从当前位置开始 length 字节的只读视图"""
+
+    def __init__(self, f, length):
+        self.f = f
+        self.start = f.tell()
+        self.end = self.start + length
+
+    def read(self, size=-1):
+        remaining = self.end - self.f.tell()
+        if size < 0 or size > remaining:
+            size = remaining
+        return self.f.read(size)
+
+    def tell(self):
+        return self.f.tell()
+
+    def seek(self, offset):
+        self.f.seek(offset)
+
+
+class RangeNotSupported(Exception):
+    """服务器不支持带 Content-Range 的 PUT"""
+
+
+class TaskQueue:
+    """可以延迟投递任务的队列，重试任务按退避时间排队"""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.heap = []
+        self.counter = itertools.count()
+        self.unfinished = 0
+
+    def put(self, task, delay=0):
+        with self.cond:
+            ready = time.monotonic() + delay
+            heapq.heappush(self.heap, (ready, next(self.counter), task))
+            self.unfinished += 1
+            self.cond.notify()
+
+    def get(self, on_wait=None):
+        """取出一个到期的任务；需要等待时先调用 on_wait"""
+        with self.cond:
+            while True:
+                wait = None
+                if self.heap:
+                    wait = self.heap[0][0] - time.monotonic()
+                    if wait <= 0:
+                        return heapq.heappop(self.heap)[2]
+                if on_wait is not None:
+                    on_wait()
+                self.cond.wait(wait)
+
+    def task_done(self):
+        with self.cond:
+            self.unfinished -= 1
+            if self.unfinished == 0:
+                self.cond.notify_all()
+
+    def join(self):
+        with self.cond:
+            while self.unfinished:
+                self.cond.wait()
+
+
+class UploadTask:
+    """一个待上传文件及其重试状态"""
+
+    def __init__(
+        self, local_path, relative_path, progress, source=None, source_etag=None
+    ):
+        self.local_path = local_path
+        self.relative_path = relative_path
+        self.progress = progress
+        self.source = source  # 内容相同的远端文件，非空时用 COPY 代替上传
+        self.source_etag = source_etag  # 源文件记录的 ETag，用于 If-Match
+        self.attempt = 0
+        self.offset = 0  # 断点续传时已确认写入服务器的字节数
+        self.size = None
+        self.resume_size = None  # 记录已上传的分段对应的文件大小
+        self.started = None  # 第一次尝试开始的时间
+
+
+def parse_multistatus(body):
+    """解析 PROPFIND 的 multistatus 响应，返回 [(href, 属性字典)]"""
+    ns = {"d": "DAV:"}
+    resources = []
+    for response in ET.fromstring(body).iterfind("d:response", ns):
+        href = response.findtext("d:href", "", ns)
+        props = {}
+        for propstat in response.iterfind("d:propstat", ns):
+            if " 200 " not in propstat.findtext("d:status", "", ns) + " ":
+                continue
+            prop = propstat.find("d:prop", ns)
+            if prop is None:
+                continue
+            resourcetype = prop.find("d:resourcetype", ns)
+            props["collection"] = (
+                resourcetype is not None
+                and resourcetype.find("d:collection", ns) is not None
+            )
+            for name in ("getcontentlength", "getlastmodified", "getetag"):
+                value = prop.findtext(f"d:{name}", None, ns)
+                if value is not None:
+                    props[name] = value.strip()
+        resources.append((href, props))
+    return resources
+
+
+def list_remote(client, root_path):
+    """从 root_path 开始逐层 PROPFIND (Depth: 1)，返回 (文件字典, 目录集合)
+
+    文件字典以相对 root_path 的未转义路径为键，值包含 size、mtime 和 etag。
+    """
+    root_path = root_path.rstrip("/") + "/"
+    files = {}
+    collections_found = set()
+    pending = [root_path]
+
+    while pending:
+        path = pending.pop()
+        response = client.request(
+            "PROPFIND",
+            path,
+            PROPFIND_BODY,
+            {"Depth": "1", "Content-Type": "application/xml; charset=utf-8"},
+        )
+        if response.status == 404:
+            continue
+        if response.status != 207:
+            raise http.client.HTTPException(
+                f"PROPFIND {path} failed: {response.status} {response.reason}"
+            )
+
+        for href, props in parse_multistatus(response.body):
+            # href 可能是完整 URL，也可能是绝对路径
+            href_path = urlparse(href).path
+            if unquote(href_path).rstrip("/") == unquote(path).rstrip("/"):
+                continue
+            relative_path = unquote(href_path)[len(unquote(root_path)) :].strip("/")
+            if props.get("collection"):
+                collections_found.add(relative_path)
+                pending.append(href_path.rstrip("/") + "/")
+                continue
+
+            mtime = None
+            if "getlastmodified" in props:
+                mtime = email.utils.parsedate_to_datetime(
+                    props["getlastmodified"]
+                ).timestamp()
+            files[relative_path] = {
+                "size": int(props.get("getcontentlength", -1)),
+                "mtime": mtime,
+                "etag": props.get("getetag"),
+            }
+
+    return files, collections_found
+
+
+def remote_is_stale(entry, remote, old_entry):
+    """根据远端属性判断本地文件是否需要上传
+
+    没有清单记录时只比较大小：新克隆或复制的目录中 mtime 总是比远端新，
+    按 mtime 判断会重传全部文件。有清单记录时，本地 mtime 与记录不同即
+    视为有变化（开启 hash 时再由调用方比较内容），不与服务器的时钟比较。
+    """
+    if remote is None or remote["size"] != entry["size"]:
+        return True
+    if old_entry is None:
+        return False
+    # 上次上传后远端被其它客户端改过
+    if old_entry.get("etag") and remote["etag"]:
+        if old_entry["etag"] != remote["etag"]:
+            return True
+    # 本地文件自上次记录以来没有动过
+    return old_entry.get("mtime") != entry["mtime"]
+
+
+class UploadPool:
+    """固定数量的上传线程，每个线程持有一个持久连接
+
+    遇到可重试的状态码或网络错误时，任务按带抖动的指数退避重新排队；
+    开启 resume 后，超过 resume_threshold 的文件分段上传，重试时从
+    服务器已确认的位置继续。
+    """
+
+    def __init__(
+        self,
+        parsed_url,
+        encoded_credentials,
+        jobs=1,
+        known_collections=(),
+        retries=5,
+        timeout=60,
+        resume=False,
+        resume_threshold=SEGMENT_SIZE,
+        label=None,
+        slots=None,
+        context=None,
+    ):
+        self.parsed_url = parsed_url
+        self.encoded_credentials = encoded_credentials
+        self.base_path = parsed_url.path.rstrip("/")
+        self.jobs = max(1, jobs)
+        self.retries = retries
+        self.timeout = timeout
+        self.resume = resume
+        self.resume_threshold = resume_threshold
+        self.label = label
+        self.slots = slots
+        self.context = context
+        self.tasks = TaskQueue()
+        self.lock = threading.Lock()
+        self.workers = []
+        self.clients = []
+        # 主线程发送 PROPFIND/MKCOL 等控制请求所用的连接
+        self.control = self.make_client()
+        # 已知在远端存在的目录（相对路径），避免重复 MKCOL
+        self.collections = set(known_collections)
+
+    def start(self):
+        for _ in range(self.jobs):
+            worker = threading.Thread(target=self._worker, daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def close(self):
+        """通知所有线程退出，并等待其关闭连接"""
+        for _ in self.workers:
+            self.tasks.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+        self.control.close()
+
+    def remote_path(self, relative_path):
+        return f"{self.base_path}/{quote(relative_path)}"
+
+    def make_collections(self, client, directories, force=False):
+        """按父目录优先的顺序创建目录，跳过已知存在的目录，返回失败信息"""
+        needed = set()
+        for directory in directories:
+            while directory:
+                needed.add(directory)
+                directory = posixpath.dirname(directory)
+
+        failures = []
+        for directory in sorted(needed, key=lambda d: (d.count("/"), d)):
+            with self.lock:
+                if not force and directory in self.collections:
+                    continue
+            path = self.remote_path(directory) + "/"
             try:
-                conn.request("PUT", remote_path, f.read(), headers)
-                response = conn.getresponse()
-                if response.status == 201:
-                    success_count += 1
-                else:
-                    failure_count += 1
-                    failure_details.append(
-                        f"Failed to upload {local_path} to {remote_path}: {response.status} {response.reason}"
-                    )
+                response = client.request("MKCOL", path)
             except Exception as e:
-                failure_count += 1
-                failure_details.append(
-                    f"Exception occurred while uploading {local_path}: {str(e)}"
+                failures.append(f"Exception occurred while creating {path}: {str(e)}")
+                continue
+            # 405 表示目录已经存在
+            if response.status in (200, 201, 405):
+                with self.lock:
+                    self.collections.add(directory)
+            else:
+                failures.append(
+                    f"Failed to create collection {path}: "
+                    f"{response.status} {response.reason}"
                 )
-            finally:
-                conn.close()
+        return failures
+
+    def make_client(self):
+        client = WebDAVClient(
+            self.parsed_url,
+            self.encoded_credentials,
+            self.timeout,
+            self.slots,
+            self.context,
+        )
+        with self.lock:
+            self.clients.append(client)
+        return client
+
+    def connection_stats(self):
+        """所有连接的建立次数和请求数"""
+        with self.lock:
+            connections = sum(client.connections for client in self.clients)
+            requests = sum(client.requests for client in self.clients)
+        return {
+            "connections": connections,
+            "requests": requests,
+            "reused": requests - connections,
+        }
+
+    def release_idle(self, client):
+        """有主机连接数限制时，空闲的连接要让给其它配置使用"""
+        if self.slots is not None:
+            client.close()
+
+    def _worker(self):
+        client = self.make_client()
+        try:
+            while True:
+                # 没有可做的任务（包括只剩等待退避的重试）时先归还连接，
+                # 否则空闲的线程会一直占着主机的连接数
+                task = self.tasks.get(lambda: self.release_idle(client))
+                if task is None:
+                    break
+                try:
+                    self._upload(client, task)
+                finally:
+                    self.tasks.task_done()
+        finally:
+            client.close()
+
+    def _record(self, task, status, latency):
+        """单个文件的上传记录，用于 --report"""
+        copied = task.source is not None
+        return {
+            "path": task.relative_path,
+            "action": "copy" if copied else "put",
+            "bytes": 0 if copied else task.size,
+            "status": status,
+            "retries": task.attempt,
+            "latency": latency,
+            "elapsed": time.monotonic() - task.started,
+        }
+
+    def _retry(self, task, detail, record, retry_after=None):
+        """还有重试次数时按退避时间重新排队，否则记为失败"""
+        if task.attempt >= self.retries:
+            task.progress.failure(detail, record)
+            return
+        if retry_after is not None and retry_after.isdigit():
+            delay = int(retry_after)
+        else:
+            # 带完全抖动的指数退避，避免多个线程同时重试
+            delay = random.uniform(0, min(60, 2**task.attempt))
+        task.attempt += 1
+        task.progress.retry()
+        self.tasks.put(task, delay)
+
+    def _upload(self, client, task):
+        remote_path = self.remote_path(task.relative_path)
+        attempt_start = time.monotonic()
+        if task.started is None:
+            task.started = attempt_start
+        try:
+            task.size = os.path.getsize(task.local_path)
+            response = self._transfer(client, task, remote_path)
+            directory = posixpath.dirname(task.relative_path)
+            if response.status == 409 and directory:
+                # 缓存的目录可能已在远端被删除，重建后再试一次
+                self.make_collections(client, [directory], force=True)
+                response = self._transfer(client, task, remote_path)
+        except Exception as e:
+            detail = f"Exception occurred while uploading {task.local_path}: {str(e)}"
+            record = self._record(task, None, time.monotonic() - attempt_start)
+            record["error"] = str(e)
+            # 本地文件错误带有 filename，重试也没用
+            if isinstance(e, http.client.HTTPException) or (
+                isinstance(e, OSError) and e.filename is None
+            ):
+                self._retry(task, detail, record)
+            else:
+                task.progress.failure(detail, record)
+            return
 
-        progress = (success_count + failure_count) / total_files * 100
-        sys.stdout.write(
-            f"\rProgress: {progress:.2f}% ({success_count + failure_count}/{total_files})"
+        record = self._record(task, response.status, time.monotonic() - attempt_start)
+        if response.status in (200, 201, 204):
+            task.progress.success(
+                task.local_path,
+                response.headers.get("ETag"),
+                task.source is not None,
+                record,
+            )
+            return
+
+        detail = (
+            f"Failed to upload {task.local_path} to {remote_path}: "
+            f"{response.status} {response.reason}"
+        )
+        if response.status in RETRYABLE_STATUSES:
+            self._retry(task, detail, record, response.headers.get("Retry-After"))
+        else:
+            task.progress.failure(detail, record)
+
+    def _transfer(self, client, task, remote_path):
+        if task.source is None:
+            return self._put(client, task, remote_path)
+
+        destination = urlunparse(
+            (self.parsed_url.scheme, self.parsed_url.netloc, remote_path, "", "", "")
         )
+        headers = {"Destination": destination, "Overwrite": "T"}
+        # 源文件在记录之后被改过时服务器返回 412，不会复制错误的内容
+        if task.source_etag:
+            headers["If-Match"] = task.source_etag
+        response = client.request(
+            "COPY", self.remote_path(task.source), headers=headers
+        )
+        # 源文件已不在远端、已被修改或服务器不支持 COPY 时改为直接上传
+        if response.status in (404, 405, 409, 412, 501):
+            task.source = None
+            return self._put(client, task, remote_path)
+        return response
+
+    def _put(self, client, task, remote_path):
+        if not self.resume or task.size < self.resume_threshold:
+            return client.put_file(task.local_path, remote_path)
+
+        # 文件在两次尝试之间变了，只能从头开始
+        if task.resume_size != task.size:
+            task.resume_size = task.size
+            task.offset = 0
+        try:
+            return self._put_segments(client, task, remote_path)
+        except RangeNotSupported:
+            with self.lock:
+                self.resume = False
+            task.offset = 0
+            return client.put_file(task.local_path, remote_path)
+
+    def _put_segments(self, client, task, remote_path):
+        """逐段上传，每段成功后记录偏移，失败重试时从该偏移继续"""
+        response = None
+        while task.offset < task.size:
+            length = min(SEGMENT_SIZE, task.size - task.offset)
+            response = client.put_segment(
+                task.local_path, remote_path, task.offset, length, task.size
+            )
+            if response.status in (400, 411, 416, 501):
+                raise RangeNotSupported()
+            if response.status not in (200, 201, 204):
+                return response
+
+            # 忽略 Content-Range 的服务器会用这一段覆盖整个文件
+            if client.remote_size(remote_path) != task.offset + length:
+                raise RangeNotSupported()
+            task.offset += length
+        return response
+
+    def run(self, files_to_upload, copies=(), progress=None):
+        """上传一批 (本地路径, 相对路径)，并按 (本地路径, 相对路径, 源相对路径,
+        源 ETag) 在服务器端复制，等待完成后返回进度统计"""
+        if progress is None:
+            progress = Progress(len(files_to_upload) + len(copies), self.label)
+        directories = {posixpath.dirname(item[1]) for item in files_to_upload}
+        directories.update(posixpath.dirname(item[1]) for item in copies)
+        start = time.monotonic()
+        for detail in self.make_collections(self.control, directories):
+            progress.detail(detail)
+        self.release_idle(self.control)
+        progress.add_time("mkcol", time.monotonic() - start)
+
+        for local_path, relative_path in files_to_upload:
+            self.tasks.put(UploadTask(local_path, relative_path, progress))
+        for local_path, relative_path, source, source_etag in copies:
+            self.tasks.put(
+                UploadTask(local_path, relative_path, progress, source, source_etag)
+            )
+        self.tasks.join()
+        return progress
+
+
+class Progress:
+    """线程安全的进度与失败统计"""
+
+    def __init__(self, total_files, label=None):
+        self.total_files = total_files
+        self.label = label
+        self.skipped_count = 0
+        self.success_count = 0
+        self.copy_count = 0
+        self.failure_count = 0
+        self.retry_count = 0
+        self.failure_details = []
+        self.uploaded = {}
+        self.records = []
+        self.timings = {}
+        self.connections = {}
+        self.lock = threading.Lock()
+
+    def add_time(self, phase, seconds):
+        with self.lock:
+            self.timings[phase] = self.timings.get(phase, 0) + seconds
+
+    def success(self, local_path, etag=None, copied=False, record=None):
+        with self.lock:
+            self.success_count += 1
+            if copied:
+                self.copy_count += 1
+            self.uploaded[local_path] = (etag, copied)
+            if record is not None:
+                self.records.append(record)
+            self._show()
+
+    def retry(self):
+        with self.lock:
+            self.retry_count += 1
+
+    def detail(self, detail):
+        """记录不计入文件数的失败信息"""
+        with self.lock:
+            self.failure_details.append(detail)
+
+    def failure(self, detail, record=None):
+        with self.lock:
+            self.failure_count += 1
+            self.failure_details.append(detail)
+            if record is not None:
+                self.records.append(record)
+            self._show()
+
+    def _show(self):
+        # 多个配置同时同步时不显示逐个文件的进度
+        if self.total_files == 0 or self.label is not None:
+            return
+        done = self.success_count + self.failure_count
+        progress = done / self.total_files * 100
+        sys.stdout.write(f"\rProgress: {progress:.2f}% ({done}/{self.total_files})")
         sys.stdout.flush()
 
-    print("\nUpload completed.")
-    print(
-        f"Total files: {total_files}, Successful: {success_count}, Failed: {failure_count}"
+    def summary(self):
+        if self.label is not None:
+            log(
+                f"[{self.label}] Upload completed. Total files: {self.total_files}, "
+                f"Successful: {self.success_count}, Failed: {self.failure_count}"
+            )
+            return
+
+        print("\nUpload completed.")
+        print(
+            f"Total files: {self.total_files}, Successful: {self.success_count}, Failed: {self.failure_count}"
+        )
+        if self.copy_count:
+            print(f"Copied on server: {self.copy_count}")
+        if self.retry_count:
+            print(f"Retries: {self.retry_count}")
+
+        if self.failure_details:
+            print("\nFailure Details:")
+            for detail in self.failure_details:
+                print(detail)
+
+
+# 无论配置如何都不会进入的目录
+DEFAULT_EXCLUDES = [".git/", ".hg/", ".svn/", "node_modules/", "__pycache__/"]
+
+
+def translate_path_glob(pattern):
+    """与 fnmatch.translate 相同，但 * 和 ? 不匹配 "/"，** 可以跨越多级目录"""
+    parts = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif c == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif c == "?":
+            parts.append("[^/]")
+            i += 1
+        elif c == "[":
+            # 紧跟在 [ 或 [! 之后的 ] 是普通字符
+            j = i + 1
+            if j < n and pattern[j] == "!":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            j = pattern.find("]", j)
+            if j < 0:
+                parts.append("\\[")
+                i += 1
+                continue
+            stuff = pattern[i + 1 : j].replace("\\", "\\\\")
+            if stuff.startswith("!"):
+                stuff = "^" + stuff[1:]
+            elif stuff.startswith("^"):
+                stuff = "\\" + stuff
+            parts.append(f"[{stuff}]")
+            i = j + 1
+        else:
+            parts.append(re.escape(c))
+            i += 1
+    return f"(?s:{''.join(parts)})\\Z"
+
+
+def compile_globs(patterns, path=False):
+    """把多个 glob 规则合并成一个正则，没有规则时返回 None
+
+    path 为真时规则匹配相对路径，按路径的各级分别匹配 * 和 ?。
+    """
+    if not patterns:
+        return None
+    translate = translate_path_glob if path else fnmatch.translate
+    return re.compile("|".join(translate(p) for p in patterns))
+
+
+class FileFilter:
+    """预编译的后缀与排除规则
+
+    exclude 中的 glob 规则含 "/" 时匹配相对路径（* 和 ? 不跨越 "/"，
+    ** 匹配任意多级目录），否则匹配文件名或目录名；以 "/" 结尾的规则
+    只匹配目录。
+    """
+
+    def __init__(self, include_extensions, exclude=()):
+        self.suffixes = frozenset(include_extensions)
+        self.lengths = sorted({len(ext) for ext in self.suffixes})
+        rules = {"dir_name": [], "dir_path": [], "name": [], "path": []}
+        for pattern in DEFAULT_EXCLUDES + list(exclude):
+            dir_only = pattern.endswith("/")
+            pattern = pattern.strip("/")
+            kind = "path" if "/" in pattern else "name"
+            rules[f"dir_{kind}" if dir_only else kind].append(pattern)
+        self.dir_name = compile_globs(rules["dir_name"] + rules["name"])
+        self.dir_path = compile_globs(rules["dir_path"] + rules["path"], path=True)
+        self.file_name = compile_globs(rules["name"])
+        self.file_path = compile_globs(rules["path"], path=True)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config["include_extensions"], config.get("exclude", []))
+
+    def include_dir(self, name, relative_path):
+        if self.dir_name and self.dir_name.match(name):
+            return False
+        return not (self.dir_path and self.dir_path.match(relative_path))
+
+    def include_file(self, name, relative_path):
+        if not any(name[-n:] in self.suffixes for n in self.lengths):
+            return False
+        if self.file_name and self.file_name.match(name):
+            return False
+        return not (self.file_path and self.file_path.match(relative_path))
+
+    def include_path(self, relative_path, is_dir=False):
+        """检查相对路径上的每一级目录和路径本身"""
+        parts = relative_path.split("/")
+        for i in range(1, len(parts)):
+            if not self.include_dir(parts[i - 1], "/".join(parts[:i])):
+                return False
+        if is_dir:
+            return self.include_dir(parts[-1], relative_path)
+        return self.include_file(parts[-1], relative_path)
+
+
+def scan_tree(folder, file_filter, prefix="", on_dir=None):
+    """用 os.scandir 遍历目录，被排除的目录不会进入；
+    返回 (本地路径, 相对路径) 列表，on_dir 对每个进入的目录调用一次"""
+    files_found = []
+    pending = [(folder, prefix)]
+    while pending:
+        folder, prefix = pending.pop()
+        if on_dir is not None:
+            on_dir(folder)
+        try:
+            entries = os.scandir(folder)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                relative_path = prefix + entry.name
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+                if is_dir:
+                    # 与 os.walk 一致，不进入指向目录的符号链接
+                    if not entry.is_symlink() and file_filter.include_dir(
+                        entry.name, relative_path
+                    ):
+                        pending.append((entry.path, relative_path + "/"))
+                elif file_filter.include_file(entry.name, relative_path):
+                    files_found.append((entry.path, relative_path))
+    return files_found
+
+
+def collect_files(config, file_filter=None):
+    """遍历 local_folder，返回匹配后缀的 (本地路径, 相对路径)"""
+    if file_filter is None:
+        file_filter = FileFilter.from_config(config)
+    return scan_tree(config["local_folder"], file_filter)
+
+
+class InotifyWatcher:
+    """基于 inotify 的目录监视，递归监视所有子目录（仅 Linux）"""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    IN_CLOEXEC = 0o2000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self, folder, file_filter):
+        libc_name = ctypes.util.find_library("c")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.folder = folder
+        self.file_filter = file_filter
+        self.paths = {}
+        self.add_tree(folder)
+
+    def add_watch(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd >= 0:
+            self.paths[wd] = path
+
+    def add_tree(self, folder):
+        """监视 folder 及其未被排除的子目录，返回其中已有的文件"""
+        prefix = os.path.relpath(folder, self.folder).replace("\\", "/")
+        if prefix == ".":
+            prefix = ""
+        elif not self.file_filter.include_path(prefix, is_dir=True):
+            return set()
+        else:
+            prefix += "/"
+        files_found = scan_tree(folder, self.file_filter, prefix, self.add_watch)
+        return {local_path for local_path, _ in files_found}
+
+    def poll(self, timeout):
+        """等待至多 timeout 秒（None 表示一直等待），返回变化的文件；
+        事件队列溢出时返回 None，表示需要全量扫描"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        changed = set()
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & self.IN_Q_OVERFLOW:
+                return None
+            if wd not in self.paths:
+                continue
+            path = os.path.join(self.paths[wd], os.fsdecode(name))
+            if mask & self.IN_ISDIR:
+                # 新目录需要补上监视，其中可能已经有文件
+                changed |= self.add_tree(path)
+            elif mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """定期比较文件的大小和 mtime，在没有 inotify 的系统上使用"""
+
+    def __init__(self, config, file_filter, interval=2.0):
+        self.config = config
+        self.file_filter = file_filter
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    def scan(self):
+        snapshot = {}
+        for local_path, _ in collect_files(self.config, self.file_filter):
+            try:
+                st = os.stat(local_path)
+            except FileNotFoundError:
+                continue
+            snapshot[local_path] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def poll(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.interval
+            if deadline is not None:
+                wait = min(wait, max(0, deadline - time.monotonic()))
+            time.sleep(wait)
+
+            snapshot = self.scan()
+            changed = {
+                path
+                for path, state in snapshot.items()
+                if self.snapshot.get(path) != state
+            }
+            self.snapshot = snapshot
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+def make_watcher(config, file_filter):
+    try:
+        return InotifyWatcher(config["local_folder"], file_filter)
+    except (OSError, AttributeError, TypeError):
+        # 非 Linux 系统上 libc 中没有 inotify 函数
+        print("inotify is not available, falling back to polling.")
+        return PollingWatcher(config, file_filter)
+
+
+def sync_with_webdav(
+    config,
+    jobs=1,
+    manifest_file=None,
+    full=False,
+    remote=False,
+    watch=False,
+    debounce=1.0,
+    label=None,
+    slots=None,
+):
+    """将指定后缀的文件同步到 WebDAV 服务器，返回首次同步的进度统计
+
+    给出 manifest_file 时只上传相对上次清单新增或变化的文件，
+    remote 为真时改为通过 PROPFIND 与远端状态对比，
+    full 为真时忽略清单全部重传。
+    watch 为真时在首次同步后继续监视目录，合并 debounce 秒内的变化批量上传。
+    label 为配置名，多个配置并行同步时用于区分输出；
+    slots 为同一主机共享的连接数信号量。
+    """
+    parsed_url = urlparse(config["webdav_url"])
+    credentials = f"{config['username']}:{config['password']}"
+    encoded_credentials = base64.b64encode(credentials.encode()).decode()
+    manifest = (
+        load_manifest(manifest_file, config["webdav_url"])
+        if manifest_file
+        else {"files": {}}
+    )
+
+    pool = UploadPool(
+        parsed_url,
+        encoded_credentials,
+        jobs,
+        [] if full else manifest.get("collections", []),
+        retries=config.get("retries", 5),
+        timeout=config.get("timeout", 60),
+        resume=config.get("resume", False),
+        resume_threshold=config.get("resume_threshold", SEGMENT_SIZE),
+        label=label,
+        slots=slots,
+        # 自建服务器可以在 cafile 中指定自签名证书或私有 CA
+        context=ssl.create_default_context(cafile=config.get("cafile")),
+    )
+    file_filter = FileFilter.from_config(config)
+    pool.start()
+    try:
+        # 先建立监视再做首次同步，避免漏掉同步期间发生的修改
+        watcher = make_watcher(config, file_filter) if watch else None
+        start = time.monotonic()
+        candidates = collect_files(config, file_filter)
+        walk_time = time.monotonic() - start
+        progress = _sync_files(
+            config, pool, manifest_file, manifest, candidates, full, remote
+        )
+        progress.add_time("walk", walk_time)
+        progress.connections = pool.connection_stats()
+        progress.summary()
+
+        if watcher is not None:
+            try:
+                watch_and_sync(
+                    config,
+                    pool,
+                    manifest_file,
+                    manifest,
+                    watcher,
+                    file_filter,
+                    debounce,
+                )
+            finally:
+                watcher.close()
+    finally:
+        pool.close()
+
+    return progress
+
+
+def watch_and_sync(
+    config, pool, manifest_file, manifest, watcher, file_filter, debounce
+):
+    """常驻运行，把连续的文件变化合并成批次，复用已打开的连接上传"""
+    print(f"Watching {config['local_folder']} for changes (Ctrl+C to stop)...")
+    try:
+        while True:
+            changed = watcher.poll(None)
+            # 持续有变化时最多等待 10 个 debounce 周期
+            deadline = time.monotonic() + debounce * 10
+            while changed is not None and time.monotonic() < deadline:
+                more = watcher.poll(debounce)
+                if more is None:
+                    changed = None
+                elif not more:
+                    break
+                else:
+                    changed |= more
+
+            if changed is None:
+                # 事件丢失，退回全量扫描
+                candidates = collect_files(config, file_filter)
+            else:
+                candidates = []
+                for path in sorted(changed):
+                    relative_path = os.path.relpath(
+                        path, config["local_folder"]
+                    ).replace("\\", "/")
+                    if file_filter.include_path(relative_path) and os.path.isfile(path):
+                        candidates.append((path, relative_path))
+            if not candidates:
+                continue
+
+            print(time.strftime("\n[%H:%M:%S]"), f"{len(candidates)} changed files")
+            progress = _sync_files(
+                config,
+                pool,
+                manifest_file,
+                manifest,
+                candidates,
+                partial=changed is not None,
+            )
+            progress.summary()
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+
+
+def _sync_files(
+    config,
+    pool,
+    manifest_file,
+    manifest,
+    candidates,
+    full=False,
+    remote=False,
+    partial=False,
+):
+    """从候选文件中挑出需要上传的交给上传池，并在结束后更新清单
+
+    partial 为真时候选文件只是目录的一部分，清单中的其它条目保持不变。
+    """
+    dedup = config.get("dedup", False)
+    use_hash = config.get("hash", False) or dedup
+    files_to_upload = []
+
+    old_files = {} if full else manifest["files"]
+    new_files = {}
+    pending = {}
+    skipped_count = 0
+
+    prefix = f"[{pool.label}] " if pool.label else ""
+
+    remote_files = None
+    if remote and not full:
+        start = time.monotonic()
+        remote_files, remote_collections = list_remote(
+            pool.control, pool.parsed_url.path
+        )
+        list_time = time.monotonic() - start
+        pool.release_idle(pool.control)
+        pool.collections = remote_collections
+        log(f"{prefix}Remote files listed: {len(remote_files)}")
+
+    for local_path, relative_path in candidates:
+        old_entry = old_files.get(relative_path)
+
+        if remote_files is not None:
+            st = os.stat(local_path)
+            entry = {"size": st.st_size, "mtime": st.st_mtime_ns}
+            remote_entry = remote_files.get(relative_path)
+            if not remote_is_stale(entry, remote_entry, old_entry):
+                if remote_entry["etag"]:
+                    entry["etag"] = remote_entry["etag"]
+                if old_entry and old_entry.get("mtime") == entry["mtime"]:
+                    if "hash" in old_entry:
+                        entry["hash"] = old_entry["hash"]
+                new_files[relative_path] = entry
+                skipped_count += 1
+                continue
+            if use_hash:
+                entry["hash"] = file_hash(local_path)
+                # 内容与上次上传的相同，且远端没有被改过
+                if (
+                    old_entry
+                    and remote_entry
+                    and remote_entry["size"] == entry["size"]
+                    and old_entry.get("hash") == entry["hash"]
+                    and old_entry.get("etag")
+                    and old_entry["etag"] == remote_entry["etag"]
+                ):
+                    entry["etag"] = remote_entry["etag"]
+                    new_files[relative_path] = entry
+                    skipped_count += 1
+                    continue
+            pending[local_path] = (relative_path, entry)
+
+        elif manifest_file:
+            entry, changed = file_state(local_path, old_entry, use_hash)
+            if not changed:
+                if old_entry and "etag" in old_entry:
+                    entry["etag"] = old_entry["etag"]
+                new_files[relative_path] = entry
+                skipped_count += 1
+                continue
+            pending[local_path] = (relative_path, entry)
+
+        files_to_upload.append((local_path, relative_path))
+
+    progress = Progress(len(files_to_upload), pool.label)
+    if remote_files is not None:
+        progress.add_time("list_remote", list_time)
+    contents = {} if full else manifest.get("contents", {})
+    if dedup:
+        hashes = {}
+        for local_path, relative_path in files_to_upload:
+            entry = pending.get(local_path, (relative_path, {}))[1]
+            hashes[local_path] = entry.get("hash") or file_hash(local_path)
+
+        uploads, known_copies, later_copies, unchanged = plan_dedup(
+            files_to_upload, hashes, contents, remote_files
+        )
+        for local_path in unchanged:
+            relative_path, entry = pending[local_path]
+            entry["etag"] = remote_files[relative_path]["etag"]
+            new_files[relative_path] = entry
+        skipped_count += len(unchanged)
+        progress.total_files -= len(unchanged)
+        log(
+            f"{prefix}Duplicate files to copy on server: {len(known_copies) + len(later_copies)}"
+        )
+
+    if manifest_file or remote_files is not None or dedup:
+        log(f"{prefix}Unchanged files skipped: {skipped_count}")
+
+    start = time.monotonic()
+    if dedup:
+        pool.run(uploads, known_copies, progress)
+        # 第一份上传成功后，其余副本才能从它复制，否则各自上传
+        copies = []
+        fallback = []
+        for local_path, relative_path, (source_local, source) in later_copies:
+            if source_local in progress.uploaded:
+                etag = progress.uploaded[source_local][0]
+                copies.append((local_path, relative_path, source, etag))
+            else:
+                fallback.append((local_path, relative_path))
+        pool.run(fallback, copies, progress)
+    else:
+        pool.run(files_to_upload, progress=progress)
+    progress.add_time("upload", time.monotonic() - start)
+    progress.skipped_count = skipped_count
+
+    # 只记录上传成功的文件，失败的文件下次会重新上传
+    if manifest_file:
+        # 被覆盖的远端文件不能再作为原来内容的副本；关闭 dedup 后
+        # 清单中仍可能留有以前的记录
+        if contents:
+            overwritten = {relative_path for _, relative_path in files_to_upload}
+            contents = {
+                digest: known
+                for digest, known in contents.items()
+                if known["path"] not in overwritten
+            }
+        for local_path, (etag, copied) in progress.uploaded.items():
+            relative_path, entry = pending[local_path]
+            if etag:
+                entry["etag"] = etag
+            new_files[relative_path] = entry
+            # 记录每种内容在远端的一份实际上传的副本，供以后 COPY
+            if dedup and not copied:
+                contents[entry["hash"]] = {"path": relative_path, "etag": etag}
+        if dedup or "contents" in manifest:
+            manifest["contents"] = contents
+        if partial:
+            manifest["files"].update(new_files)
+        else:
+            manifest["files"] = new_files
+        manifest["collections"] = sorted(pool.collections)
+        save_manifest(manifest_file, manifest)
+
+    return progress
+
+
+def percentile(sorted_values, fraction):
+    """最近秩法求分位数"""
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+# 延迟直方图的桶上界（毫秒）
+HISTOGRAM_BOUNDS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+
+def build_report(progress):
+    """汇总逐个文件的记录，生成 --report 输出的内容"""
+    records = sorted(progress.records, key=lambda record: record["path"])
+    latencies = sorted(record["latency"] for record in records)
+    total_bytes = sum(
+        record["bytes"] or 0
+        for record in records
+        if record["status"] in (200, 201, 204)
+    )
+    upload_time = progress.timings.get("upload", 0)
+
+    histogram = []
+    lower = 0
+    for upper in HISTOGRAM_BOUNDS + [None]:
+        count = sum(
+            1
+            for latency in latencies
+            if latency * 1000 >= lower and (upper is None or latency * 1000 < upper)
+        )
+        histogram.append({"min_ms": lower, "max_ms": upper, "count": count})
+        lower = upper
+
+    return {
+        "summary": {
+            "total_files": progress.total_files,
+            "skipped": progress.skipped_count,
+            "successful": progress.success_count,
+            "failed": progress.failure_count,
+            "copied": progress.copy_count,
+            "retries": progress.retry_count,
+            "bytes": total_bytes,
+            "files_per_second": (
+                progress.success_count / upload_time if upload_time else None
+            ),
+            "bytes_per_second": total_bytes / upload_time if upload_time else None,
+        },
+        "timings": progress.timings,
+        "latency": {
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else None,
+            "histogram": histogram,
+        },
+        "connections": progress.connections,
+        "files": records,
+    }
+
+
+def write_report(report_file, report):
+    with open(report_file, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def plan_dedup(files_to_upload, hashes, contents, remote_files):
+    """按内容哈希去重，返回 (上传列表, 从已有远端文件复制的列表,
+    从本次上传的文件复制的列表, 远端已是相同内容的文件)
+
+    contents 为清单中记录的哈希到远端副本 {"path", "etag"} 的映射。
+    本次要重新上传的路径不作为已有副本使用：内容可能已经不同，
+    相同时也要等它上传完成后再复制。
+    """
+    upload_paths = {relative_path for _, relative_path in files_to_upload}
+    uploads = []
+    known_copies = []
+    later_copies = []
+    unchanged = []
+    first = {}
+    for local_path, relative_path in files_to_upload:
+        digest = hashes[local_path]
+        known = contents.get(digest)
+        if known is not None and known["path"] in upload_paths:
+            known = None
+        if known is not None:
+            remote_entry = remote_files.get(relative_path) if remote_files else None
+            if (
+                remote_entry
+                and known.get("etag")
+                and remote_entry["etag"] == known["etag"]
+            ):
+                unchanged.append(local_path)
+            else:
+                known_copies.append(
+                    (local_path, relative_path, known["path"], known.get("etag"))
+                )
+        elif digest in first:
+            later_copies.append((local_path, relative_path, first[digest]))
+        else:
+            first[digest] = (local_path, relative_path)
+            uploads.append((local_path, relative_path))
+    return uploads, known_copies, later_copies, unchanged
+
+
+def manifest_path(config_file, project_id, config):
+    """清单默认放在配置文件旁的 manifests 目录，可用 manifest 项覆盖"""
+    if "manifest" in config:
+        return os.path.expanduser(config["manifest"])
+    return os.path.join(
+        os.path.dirname(os.path.abspath(config_file)),
+        "manifests",
+        f"{project_id}.json",
     )
 
-    if failure_details:
-        print("\nFailure Details:")
-        for detail in failure_details:
-            print(detail)
+
+def sync_profiles(config_file, configs, names, args):
+    """并行同步多个配置，同一主机的连接总数不超过 args.host_limit"""
+    host_slots = {}
+    for name in names:
+        netloc = urlparse(configs[name]["webdav_url"]).netloc
+        host_slots.setdefault(netloc, threading.BoundedSemaphore(args.host_limit))
+
+    results = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(names)) as executor:
+        futures = {}
+        for name in names:
+            config = configs[name]
+            log(f"[{name}] Starting synchronization of {config['local_folder']}...")
+            futures[name] = executor.submit(
+                sync_with_webdav,
+                config,
+                args.jobs,
+                manifest_path(config_file, name, config),
+                args.full,
+                args.remote,
+                label=name,
+                slots=host_slots[urlparse(config["webdav_url"]).netloc],
+            )
+        for name in names:
+            try:
+                results[name] = futures[name].result()
+            except Exception as e:
+                results[name] = e
+
+    print("\nSummary:")
+    print(f"{'Profile':<20} {'Total':>8} {'Skipped':>8} {'Success':>8} {'Failed':>8}")
+    totals = [0, 0, 0, 0]
+    for name in names:
+        progress = results[name]
+        if isinstance(progress, Exception):
+            print(f"{name:<20} error: {progress}")
+            continue
+        row = [
+            progress.total_files,
+            progress.skipped_count,
+            progress.success_count,
+            progress.failure_count,
+        ]
+        totals = [a + b for a, b in zip(totals, row)]
+        print(f"{name:<20} " + " ".join(f"{value:>8}" for value in row))
+    print(f"{'All':<20} " + " ".join(f"{value:>8}" for value in totals))
+
+    for name in names:
+        progress = results[name]
+        if not isinstance(progress, Exception) and progress.failure_details:
+            print(f"\nFailure Details [{name}]:")
+            for detail in progress.failure_details:
+                print(detail)
+
+    if args.report:
+        reports = {}
+        for name in names:
+            if isinstance(results[name], Exception):
+                reports[name] = {"error": str(results[name])}
+            else:
+                reports[name] = build_report(results[name])
+        write_report(args.report, {"profiles": reports})
 
 
 def main():
@@ -86,6 +1515,55 @@ def main():
         default=os.path.expanduser("~/.config/py-webdav-sync/config.json"),
         help="Specify the configuration file (default: ~/.config/py-webdav-sync/config.json)",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of concurrent upload connections (default: 1)",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignore the manifest and upload every matching file",
+    )
+    parser.add_argument(
+        "--remote",
+        action="store_true",
+        help="Compare against the server state (PROPFIND) instead of the manifest",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running after the first sync and upload changed files",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=1.0,
+        help="Seconds without new changes before a batch is uploaded (default: 1.0)",
+    )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Sync every profile in the configuration file in parallel",
+    )
+    parser.add_argument(
+        "--profiles",
+        type=str,
+        help="Comma-separated list of profiles to sync in parallel",
+    )
+    parser.add_argument(
+        "--host-limit",
+        type=int,
+        default=8,
+        help="Maximum connections per host when syncing several profiles (default: 8)",
+    )
+    parser.add_argument(
+        "--report",
+        type=str,
+        help="Write per-file latency, throughput and connection statistics to a JSON file",
+    )
 
     args = parser.parse_args()
     config_file = args.config
@@ -93,6 +1571,16 @@ def main():
     # 读取配置
     configs = load_config(config_file)
 
+    if args.all or args.profiles:
+        names = list(configs) if args.all else args.profiles.split(",")
+        unknown = [name for name in names if name not in configs]
+        if unknown:
+            parser.error(f"unknown profiles: {', '.join(unknown)}")
+        if args.watch:
+            parser.error("--watch cannot be combined with --all or --profiles")
+        sync_profiles(config_file, configs, names, args)
+        return
+
     # 获取当前执行目录的绝对路径
     current_path = os.path.abspath(os.getcwd())
 
@@ -101,8 +1589,18 @@ def main():
     for project_id, config in configs.items():
         if os.path.abspath(config["local_folder"]) == current_path:
             print(f"Matched configuration: {project_id}\nStarting synchronization...")
-            sync_with_webdav(config)
+            progress = sync_with_webdav(
+                config,
+                args.jobs,
+                manifest_path(config_file, project_id, config),
+                args.full,
+                args.remote,
+                args.watch,
+                args.debounce,
+            )
             matched = True
+            if args.report:
+                write_report(args.report, build_report(progress))
             break
 
     if not matched: